@@ -0,0 +1,55 @@
+"""
+Compare the threaded and async fetch engines against the local Letterboxd stand-in.
+
+    python bench/bench_engines.py --users 5 --size 1000 --latency 0.05
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from random_movie import config, core
+from fake_letterboxd import FakeLetterboxd, synthetic_watchlist
+
+def run(engine, usernames, repeat):
+    timings = []
+    for _ in range(repeat):
+        core.watchlists.clear()
+        start = time.perf_counter()
+        if len(usernames) == 1:
+            df = core.fetch_watchlist(usernames[0], engine=engine)
+        else:
+            df = core.fetch_multiple_watchlists(usernames, engine=engine)
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(df)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--size", type=int, default=1000, help="films per watchlist")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    config.PERSIST_CACHE = False
+    config.RATE_LIMIT = None # The local stand-in never throttles
+    core.preload_modules(engine="async")
+    usernames = [f"user{i}" for i in range(args.users)]
+    lists = {user: synthetic_watchlist(args.size, seed=i, pool=args.size * 2) for i, user in enumerate(usernames)}
+
+    with FakeLetterboxd(lists, latency=args.latency) as fake:
+        config.WATCHLIST_URL = fake.watchlist_url
+        engines = ["threads"] + (["async"] if core.httpx else [])
+        print(f"{args.users} user(s) x {args.size} films, {args.latency * 1000:.0f} ms latency")
+        for engine in engines:
+            before = fake.request_count
+            elapsed, rows = run(engine, usernames, args.repeat)
+            requests_made = (fake.request_count - before) // args.repeat
+            print(f"{engine:>8}: {elapsed:7.3f} s  {requests_made} requests  {rows} films")
+        if not core.httpx:
+            print("   async: skipped (httpx is not installed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Memory held by the in-process caches for many users: watchlists, metadata and group intersections.
+
+    python bench/bench_memory.py --users 50 --size 1000
+"""
+import os
+import sys
+import random
+import argparse
+import tracemalloc
+import gc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from random_movie import config, core, sampling
+from fake_letterboxd import FakeLetterboxd, synthetic_watchlist
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--size", type=int, default=1000, help="films per watchlist")
+    parser.add_argument("--groups", type=int, default=100, help="random groups of 2-6 users to intersect")
+    parser.add_argument("--plain", action="store_true", help="keep plain string/object columns (COMPACT_STORAGE off)")
+    args = parser.parse_args()
+
+    config.PERSIST_CACHE = False
+    config.RATE_LIMIT = None # The local stand-in never throttles
+    config.COMPACT_STORAGE = not args.plain
+    core.preload_modules() # Keep pandas' own memory out of the measurement
+    usernames = [f"user{i}" for i in range(args.users)]
+    lists = {user: synthetic_watchlist(args.size, seed=i, pool=args.size * 3) for i, user in enumerate(usernames)}
+
+    with FakeLetterboxd(lists) as fake:
+        config.WATCHLIST_URL = fake.watchlist_url
+        config.FILM_URL = fake.base_url + "/film/{}/"
+
+        gc.collect()
+        tracemalloc.start()
+        for user in usernames:
+            core.fetch_watchlist(user)
+        gc.collect()
+        after_watchlists = tracemalloc.get_traced_memory()[0]
+
+        for user in usernames:
+            sampling.fetch_metadata_background(core.watchlists[user], workers=8, prefetch_posters=False)
+        gc.collect()
+        after_metadata = tracemalloc.get_traced_memory()[0]
+
+        rng = random.Random(0)
+        for _ in range(args.groups):
+            core.fetch_multiple_watchlists(rng.sample(usernames, rng.randint(2, 6)))
+        gc.collect()
+        after_intersections = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    intersections = sum(1 for key in core.watchlists if isinstance(key, tuple))
+    mb = 1024 * 1024
+    print(f"{args.users} users x {args.size} films, compact storage: {config.COMPACT_STORAGE}")
+    print(f"  watchlists:                {after_watchlists / mb:8.1f} MB")
+    print(f"  + metadata:                {(after_metadata - after_watchlists) / mb:8.1f} MB")
+    print(f"  + {intersections:4d} intersections:    {(after_intersections - after_metadata) / mb:8.1f} MB")
+    print(f"  total:                     {after_intersections / mb:8.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Parse throughput on the fetch threads versus the parse pool with 1, 2, 4 ... worker processes
+(up to the number of cores). Pages go through parse_response from FETCH_WORKERS threads, the
+way fetched pages do.
+
+    python bench/bench_parse_pool.py --backend bs4 --pages 400
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from random_movie import config, core
+from fake_letterboxd import synthetic_watchlist, render_watchlist_page, render_film_page
+
+class PageResponse:
+    """Just the parts of a response that parse_response reads"""
+    def __init__(self, html_text):
+        self.content = html_text.encode()
+        self.encoding = "utf-8"
+
+def process_counts():
+    counts, n = [], 1
+    while n < os.cpu_count():
+        counts.append(n)
+        n *= 2
+    return counts + [os.cpu_count()]
+
+def throughput(processes, watchlist_pages, film_pages):
+    """(watchlist pages/s, film pages/s) with PARSE_PROCESSES = processes"""
+    config.PARSE_PROCESSES = processes
+    pool = core.get_parse_pool()
+    if pool:
+        list(pool.map(core.parse_watchlist_response, [page.content for page in watchlist_pages[:processes * 2]],
+                      ["utf-8"] * processes * 2)) # Start every worker before timing
+    rates = []
+    with ThreadPoolExecutor(max_workers=config.FETCH_WORKERS) as threads:
+        for parser, pages in ((core.parse_watchlist_response, watchlist_pages), (core.parse_film_response, film_pages)):
+            start = time.perf_counter()
+            list(threads.map(lambda response: core.parse_response(parser, response), pages))
+            rates.append(len(pages) / (time.perf_counter() - start))
+    if pool:
+        pool.shutdown()
+        core.parse_pool = None
+    return rates
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200, help="watchlist pages (and film pages) per run")
+    parser.add_argument("--backend", default=config.PARSER_BACKEND, help="parser backend (bs4, selectolax, regex, auto)")
+    args = parser.parse_args()
+
+    config.PARSER_BACKEND = args.backend
+    core.preload_modules()
+    film_ids = synthetic_watchlist(28 * args.pages, seed=1)
+    watchlist_pages = [PageResponse(render_watchlist_page("synthetic", film_ids, page)) for page in range(1, args.pages + 1)]
+    film_pages = [PageResponse(render_film_page(film_id, "https://letterboxd.com")) for film_id in film_ids[:args.pages]]
+
+    print(f"{core.parser_backend()} backend, {args.pages} pages of each kind, {os.cpu_count()} cores")
+    print(f"{'parsing on':<24}{'watchlist pages/s':>19}{'film pages/s':>14}{'speedup':>9}")
+    baseline = None
+    for processes in [0] + process_counts():
+        watchlist_rate, film_rate = throughput(processes, watchlist_pages, film_pages)
+        baseline = baseline or watchlist_rate
+        label = f"{processes} process{'es' if processes > 1 else ''}" if processes else f"{config.FETCH_WORKERS} fetch threads"
+        print(f"{label:<24}{watchlist_rate:>19.0f}{film_rate:>14.0f}{watchlist_rate / baseline:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Bandwidth and time to refresh an already warm cache, with and without the HTTP cache
+(ETag revalidation). Each mode warms a fresh cache directory from the local stand-in, then
+times three refreshes of it: revalidating every watchlist, re-scraping every watchlist page
+and fetching every film's details again once they have expired.
+
+    python bench/bench_refresh.py --users 5 --size 500 --latency 0.02
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from random_movie import config, core
+from fake_letterboxd import FakeLetterboxd, synthetic_watchlist
+
+def use_cache_dir(path):
+    config.CACHE_DIR = path
+    config.CACHE_DB = os.path.join(path, "cache.sqlite3")
+    config.POSTER_DIR = os.path.join(path, "posters")
+    config.HTTP_CACHE_DIR = os.path.join(path, "http")
+    core.http_cache_bytes = None
+
+def forget_memory():
+    core.watchlists.clear()
+    core.metadata_cache.clear()
+    core.revalidated_users.clear()
+
+def refreshes(usernames):
+    """(label, function) for each refresh, run in this order against a warm cache"""
+    def revalidate():
+        core.warm_cache(usernames, posters=False, fresh_for=0)
+
+    def rescrape():
+        core.scrape_watchlists(usernames)
+
+    def refetch_films():
+        for user in usernames:
+            core.watchlists[user] = core.load_cached_watchlist(user)
+        config.METADATA_TTL = 0  # Every stored film's details have expired
+        try:
+            core.warm_films(usernames, defaultdict(int), False, 8)
+        finally:
+            config.METADATA_TTL = 30 * 24 * 60 * 60
+    return [("revalidate watchlists", revalidate), ("re-scrape watchlists", rescrape), ("refetch film details", refetch_films)]
+
+def measure(fake, run):
+    """(seconds, requests, 304s, bytes sent) for one call of run()"""
+    before = fake.request_count, fake.status_counts.get(304, 0), fake.bytes_sent
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run()
+    after = fake.request_count, fake.status_counts.get(304, 0), fake.bytes_sent
+    return (time.perf_counter() - start, *(a - b for a, b in zip(after, before)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--size", type=int, default=300, help="films per watchlist")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every response")
+    args = parser.parse_args()
+
+    config.RATE_LIMIT = None # The local stand-in never throttles
+    core.preload_modules()
+    usernames = [f"user{i}" for i in range(args.users)]
+    lists = {user: synthetic_watchlist(args.size, seed=i, pool=args.size * 2) for i, user in enumerate(usernames)}
+
+    print(f"{args.users} users x {args.size} films, {args.latency * 1000:.0f} ms latency")
+    print(f"{'refresh':<24}{'HTTP cache':>11}{'seconds':>9}{'requests':>10}{'304s':>6}{'KB sent':>10}")
+    for http_cache in (False, True):
+        config.HTTP_CACHE = http_cache
+        with tempfile.TemporaryDirectory() as cache_dir, FakeLetterboxd(lists, latency=args.latency) as fake:
+            use_cache_dir(cache_dir)
+            config.WATCHLIST_URL = fake.watchlist_url
+            config.FILM_URL = fake.base_url + "/film/{}/"
+            forget_memory()
+            measure(fake, lambda: core.warm_cache(usernames, posters=False))
+            for label, run in refreshes(usernames):
+                forget_memory()
+                seconds, requests_made, not_modified, bytes_sent = measure(fake, run)
+                print(f"{label:<24}{'on' if http_cache else 'off':>11}{seconds:>9.2f}{requests_made:>10}"
+                      f"{not_modified:>6}{bytes_sent / 1024:>10.0f}")
+
+if __name__ == "__main__":
+    main()
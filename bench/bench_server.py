@@ -0,0 +1,79 @@
+"""
+Fire concurrent /pick requests at the headless server, backed by the local Letterboxd stand-in.
+
+    python bench/bench_server.py --clients 200 --requests 1000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from random_movie import config, core, sampling
+from random_movie.server import PickerServer, PickerRequestHandler
+from fake_letterboxd import FakeLetterboxd, synthetic_watchlist
+
+def start_picker_server(workers):
+    sampling.metadata_scheduler.session = core.get_shared_session()
+    sampling.metadata_scheduler.ensure_workers(workers)
+    server = PickerServer(("127.0.0.1", 0), PickerRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return response.status, json.loads(response.read())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=3, help="users per group")
+    parser.add_argument("--size", type=int, default=500, help="films per watchlist")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    config.PERSIST_CACHE = False
+    config.RATE_LIMIT = None # The local stand-in never throttles
+    core.preload_modules()
+    usernames = [f"user{i}" for i in range(args.users)]
+    lists = {user: synthetic_watchlist(args.size, seed=i, pool=args.size * 2) for i, user in enumerate(usernames)}
+
+    with FakeLetterboxd(lists, latency=args.latency) as fake:
+        config.WATCHLIST_URL = fake.watchlist_url
+        config.FILM_URL = fake.base_url + "/film/{}/"
+        server = start_picker_server(workers=32)
+        api = f"http://127.0.0.1:{server.server_address[1]}"
+
+        # Sanity check every endpoint once, which also warms the watchlist cache
+        start = time.perf_counter()
+        status, body = get_json(f"{api}/intersection?users={','.join(usernames)}")
+        print(f"cold /intersection: {status}, {body['count']} films in {time.perf_counter() - start:.2f} s")
+        status, body = get_json(f"{api}/watchlist/{usernames[0]}")
+        print(f"/watchlist/{usernames[0]}: {status}, {body['count']} films")
+
+        def pick(_):
+            start = time.perf_counter()
+            status, body = get_json(f"{api}/pick?users={','.join(usernames)}&n=3")
+            return status, time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as executor:
+            results = list(executor.map(pick, range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for status, _ in results if status != 200)
+        print(f"{args.requests} picks from {args.clients} clients in {elapsed:.2f} s ({args.requests / elapsed:.0f} req/s), {errors} errors")
+        print(f"p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms")
+        print(f"Letterboxd stand-in served {fake.request_count} requests")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Cold-start time: `import random_movie` in a fresh interpreter, and time until the window is on
+screen for `python -m random_movie` or a PyInstaller build. Fails (exit status 1) when either
+is over budget, or when pandas or the network stack were loaded before they were needed.
+
+    python bench/bench_startup.py
+    python bench/bench_startup.py --app dist/MoviePicker.app/Contents/MacOS/MoviePicker
+    python bench/bench_startup.py --max-import-ms 100 --max-window-ms 800
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["pandas", "numpy", "requests", "bs4", "PIL", "httpx", "pyarrow", "tkinter"]
+# Modules that may be loaded before the window shows; the rest load after it
+WINDOW_MODULES = {"tkinter"}
+
+IMPORT_SNIPPET = "import sys, json, random_movie; print(json.dumps([m for m in %r if m in sys.modules]))" % HEAVY_MODULES
+
+def parse_importtime(stderr, module="random_movie"):
+    """(cumulative ms, {direct import: cumulative ms}) for one module from -X importtime output"""
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0 and name.strip() == module:
+            return int(cumulative) / 1000, children
+        if depth == 0:
+            children = {}  # Output is post-order: a module's imports are listed just before it
+        elif depth == 1:
+            children[name.strip()] = int(cumulative) / 1000
+    raise Exception(f"{module} not found in -X importtime output")
+
+def measure_import(runs):
+    """Median `import random_movie` time in fresh interpreters, the slowest direct imports and any heavy module loaded"""
+    totals, children, loaded = [], {}, set()
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET],
+                                cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+        total, imports = parse_importtime(result.stderr)
+        totals.append(total)
+        for name, ms in imports.items():
+            children.setdefault(name, []).append(ms)
+        loaded.update(json.loads(result.stdout.strip().splitlines()[-1]))
+    slowest = sorted(((statistics.median(ms), name) for name, ms in children.items()), reverse=True)[:8]
+    return statistics.median(totals), slowest, sorted(loaded)
+
+def has_display():
+    return sys.platform in ("darwin", "win32") or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+def measure_window(command, runs):
+    """Median seconds from launch until the window is on screen, and the heavy modules loaded by then"""
+    timings, loaded = [], set()
+    for _ in range(runs):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            probe = f.name
+            json.dump({"launched_at": time.time()}, f)
+        try:
+            subprocess.run(command, cwd=ROOT_DIR, env=dict(os.environ, RANDOM_MOVIE_STARTUP_PROBE=probe),
+                           capture_output=True, timeout=120, check=True)
+            with open(probe) as f:
+                report = json.load(f)
+        finally:
+            os.remove(probe)
+        if "window_s" not in report:
+            raise Exception(f"{command[-1]} exited without showing the window")
+        timings.append(report["window_s"])
+        loaded.update(report["loaded"])
+    return statistics.median(timings), sorted(loaded)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=150, help="budget for `import random_movie`")
+    parser.add_argument("--max-window-ms", type=float, default=1500, help="budget for the window to appear")
+    parser.add_argument("--app", help="PyInstaller executable to time instead of `python -m random_movie`")
+    parser.add_argument("--skip-window", action="store_true", help="only measure the import")
+    args = parser.parse_args()
+    failures = []
+
+    import_ms, slowest, loaded = measure_import(args.runs)
+    print(f"import random_movie: {import_ms:.1f} ms (median of {args.runs}, budget {args.max_import_ms:.0f} ms)")
+    for ms, name in slowest:
+        print(f"  {name:<28}{ms:>8.1f} ms")
+    if import_ms > args.max_import_ms:
+        failures.append(f"import took {import_ms:.1f} ms")
+    if loaded:
+        failures.append(f"import loaded {', '.join(loaded)}")
+
+    if args.skip_window:
+        pass
+    elif not has_display():
+        print("window: skipped (no display)")
+    else:
+        command = [os.path.abspath(args.app)] if args.app else [sys.executable, "-m", "random_movie"]
+        window_s, loaded = measure_window(command, args.runs)
+        print(f"window shown: {window_s * 1000:.0f} ms after launch (median of {args.runs}, budget {args.max_window_ms:.0f} ms)")
+        print(f"  loaded before the window: {', '.join(loaded) or 'nothing heavy'}")
+        if window_s * 1000 > args.max_window_ms:
+            failures.append(f"window took {window_s * 1000:.0f} ms")
+        if set(loaded) - WINDOW_MODULES:
+            failures.append(f"{', '.join(sorted(set(loaded) - WINDOW_MODULES))} loaded before the window")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
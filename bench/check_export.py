@@ -0,0 +1,111 @@
+"""
+Round-trip check for export_cache / import_cache: a cache holding watchlists, intersections
+(one of them empty) and film details is exported in every format, imported into an empty
+cache directory and compared with the original, with nothing left in memory. Also checks
+that stored intersections are used by fetch_multiple_watchlists and dropped when a member's
+watchlist is replaced. Exits with status 1 on any difference.
+
+    python bench/check_export.py
+"""
+import io
+import os
+import sys
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from random_movie import config, core
+from fake_letterboxd import film_info, synthetic_watchlist
+
+WATCHLISTS = {"a": synthetic_watchlist(60, seed=1, pool=100), "b": synthetic_watchlist(40, seed=2, pool=100),
+              "c": [1, 2, 3], "d": [4, 5]}
+INTERSECTIONS = [("a", "b"), ("c", "d")]
+
+def use_cache_dir(path):
+    config.CACHE_DIR = path
+    config.CACHE_DB = os.path.join(path, "cache.sqlite3")
+    restart()
+
+def restart():
+    """Forget everything held in memory, as a new process would"""
+    core.watchlists.clear()
+    core.metadata_cache.clear()
+
+def build_cache():
+    """Store the watchlists, their films' details and the groups' intersections"""
+    for username, film_ids in WATCHLISTS.items():
+        infos = [film_info(film_id) for film_id in film_ids]
+        df = core.watchlist_frame([[info["name"], str(info["year"]), info["slug"], info["film_id"], info["lid"],
+                                            f"https://boxd.it/{info['lid']}"] for info in infos])
+        core.save_cached_watchlist(username, df, len(df), fetched_at=1700000000.0)
+        for info in infos:
+            core.save_cached_metadata(info["slug"], {"directors": [f"Director {info['film_id'] % 7}"], "genres": ["Drama"],
+                                                              "rating": 3.5, "runtime": 100, "image": None})
+    for group in INTERSECTIONS:
+        dfs = [core.load_cached_watchlist(user) for user in group]
+        common = set.intersection(*(set(df["Slug"]) for df in dfs))
+        core.save_cached_intersection(group, dfs[0][dfs[0]["Slug"].isin(common)][core.WATCHLIST_COLUMNS].copy())
+    restart()
+
+def snapshot():
+    """Everything the cache holds, as comparable plain data"""
+    lists = {}
+    for username, df in core.iter_cached_watchlists(sorted(WATCHLISTS)):
+        lists[username] = (df.attrs["fetched_at"], df.attrs["num_entries"], core.watchlist_rows(df))
+    groups = {key: core.watchlist_rows(df) for key, df in core.iter_cached_intersections()}
+    metadata = {key: metadata for batch in core.iter_cached_metadata() for key, _, metadata in batch}
+    return lists, groups, metadata
+
+def check_stored_intersections(failures):
+    """A stored intersection is served without intersecting again, and replacing a member's watchlist drops it"""
+    core.save_cached_intersection(("a", "b"), core.load_cached_intersection(("a", "b")).head(3))
+    restart()
+    if len(core.fetch_multiple_watchlists(["b", "a"])) != 3:
+        failures.append("stored: fetch_multiple_watchlists worked the (a, b) intersection out again instead of loading it")
+    restart()
+    core.save_cached_watchlist("c", core.load_cached_watchlist("c").head(2), 2)
+    groups = {key for key, _ in core.iter_cached_intersections()}
+    if groups != {("a", "b")}:
+        failures.append(f"stored: after replacing c's watchlist the stored intersections are {sorted(groups)}")
+
+def main():
+    config.PERSIST_CACHE = True
+    config.WATCHLIST_FRESH_FOR = float("inf") # Never revalidate the stored watchlists against Letterboxd
+    formats = {"jsonl": "cache.jsonl.gz"}
+    if core.pa is not None:
+        formats["parquet"] = "cache_parquet"
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        use_cache_dir(os.path.join(tmp, "source"))
+        build_cache()
+        expected = snapshot()
+        if ("c", "d") not in expected[1] or expected[1][("c", "d")]:
+            failures.append("the (c, d) intersection should be cached and empty")
+        for fmt, name in formats.items():
+            use_cache_dir(os.path.join(tmp, "source"))
+            build_cache()
+            with contextlib.redirect_stdout(io.StringIO()):
+                core.export_cache(os.path.join(tmp, name), fmt=fmt)
+                use_cache_dir(os.path.join(tmp, f"imported_{fmt}"))
+                try:
+                    core.import_cache(os.path.join(tmp, name), fmt=fmt)
+                except Exception as e:
+                    failures.append(f"{fmt}: import failed: {e!r}")
+                    continue
+            restart()
+            for label, want, got in zip(("watchlists", "intersections", "metadata"), expected, snapshot()):
+                if want != got:
+                    failures.append(f"{fmt}: {label} differ after the round trip ({sorted(set(want) ^ set(got)) or 'contents'})")
+            print(f"{fmt:>8}: {'ok' if not any(f.startswith(fmt) for f in failures) else 'FAILED'}")
+        use_cache_dir(os.path.join(tmp, "stored"))
+        build_cache()
+        with contextlib.redirect_stdout(io.StringIO()):
+            check_stored_intersections(failures)
+        print(f"{'stored':>8}: {'ok' if not any(f.startswith('stored') for f in failures) else 'FAILED'}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Check fetch_multiple_watchlists against a plain set intersection on the local stand-in, for
+groups mixing single-page and multi-page watchlists (and the cached result for each group).
+Exits with status 1 on any mismatch.
+
+    python bench/check_intersections.py
+"""
+import io
+import os
+import sys
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from random_movie import config, core
+from fake_letterboxd import FakeLetterboxd, synthetic_watchlist
+
+WATCHLISTS = {
+    "x": [1, 2, 3, 4, 5],
+    "y": [1, 2, 3, 9, 10, 11, 12],
+    "z": [2, 3],
+    "empty_overlap": [40, 41],
+    "big1": synthetic_watchlist(200, seed=1, pool=300) + [1, 2, 3],
+    "big2": synthetic_watchlist(150, seed=2, pool=300) + [2, 3],
+}
+
+GROUPS = [
+    ("x", "y"),
+    ("x", "y", "z"),
+    ("y", "x"),
+    ("x", "empty_overlap"),
+    ("big1", "x"),
+    ("x", "big1", "y"),
+    ("big1", "big2"),
+    ("big1", "big2", "z"),
+]
+
+def expected(group):
+    return set.intersection(*(set(WATCHLISTS[user]) for user in group))
+
+def main():
+    config.PERSIST_CACHE = False
+    config.RATE_LIMIT = None # The local stand-in never throttles
+    failures = []
+    with FakeLetterboxd(WATCHLISTS) as fake:
+        config.WATCHLIST_URL = fake.watchlist_url
+        config.FILM_URL = fake.base_url + "/film/{}/"
+        for streaming in (True, False):
+            config.STREAMING_INTERSECTION = streaming
+            for group in GROUPS:
+                core.watchlists.clear()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    first = core.fetch_multiple_watchlists(list(group))
+                    cached = core.fetch_multiple_watchlists(list(group))
+                for label, result in (("fetched", first), ("cached", cached)):
+                    got = set(result["Film ID"].astype(int))
+                    if got != expected(group):
+                        failures.append(f"{'streaming' if streaming else 'batch'} {label} {group}: "
+                                        f"{sorted(got)} != {sorted(expected(group))}")
+    print(f"{len(GROUPS) * 2} groups checked, {len(failures)} mismatches")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
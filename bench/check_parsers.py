@@ -0,0 +1,82 @@
+"""
+Golden-file check for the parser backends, plus parse throughput for each.
+Every available backend must produce exactly the records stored in fixtures/golden/,
+and identical records to BeautifulSoup on a batch of synthetic pages.
+
+    python bench/check_parsers.py
+"""
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from random_movie import core
+from fake_letterboxd import render_watchlist_page, render_film_page, synthetic_watchlist
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "golden")
+
+def available_backends():
+    return ["bs4", "regex"] + (["selectolax"] if core.selectolax_parser() is not None else [])
+
+def read_golden(name):
+    with open(os.path.join(GOLDEN_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+def check_golden(backend):
+    failures = []
+    expected = json.loads(read_golden("watchlist_page.json"))
+    movies, total_entries = core.WATCHLIST_PARSERS[backend](read_golden("watchlist_page.html"))
+    if total_entries != expected["total_entries"]:
+        failures.append(f"data-num-entries: {total_entries} != {expected['total_entries']}")
+    if movies != expected["movies"]:
+        for got, want in zip(movies, expected["movies"]):
+            if got != want:
+                failures.append(f"watchlist record: {got} != {want}")
+        if len(movies) != len(expected["movies"]):
+            failures.append(f"watchlist records: {len(movies)} != {len(expected['movies'])}")
+
+    metadata = core.parse_film_metadata(read_golden("film_page.html"), backend=backend)
+    if metadata != json.loads(read_golden("film_page.json")):
+        failures.append("film page JSON-LD differs")
+    return failures
+
+def check_synthetic(backend, pages):
+    failures = []
+    for i, html in enumerate(pages):
+        if core.WATCHLIST_PARSERS[backend](html) != core.parse_watchlist_page_bs4(html):
+            failures.append(f"synthetic page {i + 1} differs from bs4")
+    return failures
+
+def throughput(backend, pages, film_pages):
+    start = time.perf_counter()
+    for html in pages:
+        core.WATCHLIST_PARSERS[backend](html)
+    watchlist_rate = len(pages) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for html in film_pages:
+        core.parse_film_metadata(html, backend=backend)
+    film_rate = len(film_pages) / (time.perf_counter() - start)
+    return watchlist_rate, film_rate
+
+def main():
+    film_ids = synthetic_watchlist(28 * 40, seed=1)
+    pages = [render_watchlist_page("synthetic", film_ids, page) for page in range(1, 41)]
+    film_pages = [render_film_page(film_id, "https://letterboxd.com") for film_id in film_ids[:200]]
+
+    ok = True
+    for backend in available_backends():
+        failures = check_golden(backend) + check_synthetic(backend, pages)
+        watchlist_rate, film_rate = throughput(backend, pages, film_pages)
+        status = "ok" if not failures else "FAILED"
+        print(f"{backend:>10}: {status:6}  {watchlist_rate:8.1f} watchlist pages/s  {film_rate:8.1f} film pages/s")
+        for failure in failures:
+            print(f"            {failure}")
+        ok = ok and not failures
+
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Check MovieSampler against a plain scan of the watchlist: every filter and combination of
+filters, no-repeat and repeat pools, each weighting, and what happens once a pool runs out.
+Runs offline on a synthetic watchlist. Exits with status 1 on any failure.
+
+    python bench/check_sampler.py
+"""
+import io
+import os
+import sys
+import random
+import contextlib
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from random_movie import config, core, sampling
+from fake_letterboxd import GENRES, film_info, synthetic_watchlist
+
+FILMS = 400
+DRAWS = 20000 # Picks per weighting check
+
+def film_metadata(film_id):
+    """Details like fake_letterboxd's film pages, with some films missing a rating or runtime"""
+    return {"directors": [f"Director {film_id % 13}"],
+            "genres": sorted({GENRES[film_id % len(GENRES)], GENRES[(film_id // 3) % len(GENRES)]}),
+            "rating": None if film_id % 17 == 0 else round(0.5 + (film_id % 10) / 2, 1),
+            "runtime": None if film_id % 19 == 0 else 70 + film_id % 110, "image": f"https://example.com/poster/{film_id}.jpg"}
+
+def build_watchlist():
+    film_ids = synthetic_watchlist(FILMS, seed=3)
+    infos = [film_info(film_id) for film_id in film_ids]
+    df = core.watchlist_frame([[info["name"], str(info["year"]), info["slug"], info["film_id"], info["lid"],
+                                        f"https://boxd.it/{info['lid']}"] for info in infos])
+    core.apply_metadata(df, list(df.index), [film_metadata(film_id) for film_id in film_ids])
+    return df
+
+def matches(row, genre=None, director=None, year=None, runtime=None, min_rating=None):
+    """The filters applied one row at a time"""
+    meta = row["Metadata"]
+    def within(value, bounds):
+        return value is not None and (bounds[0] is None or value >= bounds[0]) and (bounds[1] is None or value <= bounds[1])
+    return ((not genre or genre.lower() in [g.lower() for g in meta["genres"]])
+            and (not director or director.lower() in [d.lower() for d in meta["directors"]])
+            and (not year or within(int(row["Year"]), year))
+            and (not runtime or within(meta["runtime"], runtime))
+            and (min_rating is None or within(meta["rating"], (min_rating, None))))
+
+FILTERS = [
+    {},
+    {"genre": "Horror"},
+    {"genre": "horror"},
+    {"genre": "Western"},
+    {"director": "Director 4"},
+    {"year": (1970, 1989)},
+    {"year": (None, 1950)},
+    {"runtime": (None, 90)},
+    {"runtime": (120, 150)},
+    {"min_rating": 3.5},
+    {"genre": "Drama", "year": (1960, None), "min_rating": 2.0},
+    {"genre": "Comedy", "director": "Director 2", "runtime": (80, 160)},
+]
+
+def check_filters(df, failures):
+    sampler = sampling.MovieSampler(df)
+    for filters in FILTERS:
+        want = {label for label, row in df.iterrows() if matches(row, **filters)}
+        got = {sampler.labels[i] for i in sampler.candidates(**filters)}
+        if got != want:
+            failures.append(f"filter {filters}: {len(got)} candidates, expected {len(want)}")
+        picked = sampling.MovieSampler(df).pick(len(df) + 5, **filters)
+        if set(picked) != want or len(picked) != len(want):
+            failures.append(f"filter {filters}: picking everything gave {len(picked)} films, expected {len(want)}")
+
+def check_no_repeat(df, failures):
+    filters = {"genre": "Drama"}
+    sampler = sampling.MovieSampler(df)
+    pool = set(sampler.labels[i] for i in sampler.candidates(**filters))
+    picked = [label for _ in range(len(pool)) for label in sampler.pick(1, **filters)]
+    if len(picked) != len(pool) or set(picked) != pool:
+        failures.append(f"no_repeat: {len(pool)} single picks gave {len(set(picked))} distinct of {len(picked)} films")
+    # The pool has run out, so the next pick starts over rather than coming back empty
+    again = sampler.pick(3, **filters)
+    if len(again) != 3 or not set(again) <= pool:
+        failures.append(f"no_repeat: after the pool ran out, a pick of 3 gave {again}")
+    # Seen films are shared between pools: a film picked unfiltered is skipped by a filtered pick
+    sampler = sampling.MovieSampler(df)
+    first = sampler.pick(len(df) // 2)
+    if set(first) & set(sampler.pick(len(df), **filters)):
+        failures.append("no_repeat: a filtered pool picked films already seen through another pool")
+    # Unmarked picks (pre-picks) leave the pool alone, and excluded films are never picked
+    sampler = sampling.MovieSampler(df)
+    held = sampler.pick(5, mark=False, **filters)
+    if any(sampler.is_seen(label) for label in held):
+        failures.append("no_repeat: pick(mark=False) marked its films as seen")
+    if set(held) & set(sampler.pick(len(pool), exclude=held, **filters)):
+        failures.append("no_repeat: excluded films were picked")
+
+def check_repeat(df, failures):
+    sampler = sampling.MovieSampler(df)
+    everything = sampler.pick(len(df))  # Marks every film seen
+    if len(set(everything)) != len(df):
+        failures.append(f"repeat: picking every film gave {len(set(everything))} of {len(df)}")
+    picked = [label for _ in range(50) for label in sampler.pick(1, no_repeat=False)]
+    if len(picked) != 50:
+        failures.append(f"repeat: {len(picked)} of 50 repeat picks returned a film after every film had been seen")
+    # Repeat picks don't mark anything, so a no-repeat pool built afterwards still sees every film
+    sampler = sampling.MovieSampler(df)
+    sampler.pick(len(df), no_repeat=False)
+    if len(sampler.pick(len(df))) != len(df):
+        failures.append("repeat: picks with no_repeat=False marked films as seen")
+    # One pick of n is still n different films
+    many = sampler.pick(30, no_repeat=False)
+    if len(set(many)) != len(many):
+        failures.append("repeat: one pick returned the same film twice")
+
+def frequencies(sampler, weight, **filters):
+    counts = Counter()
+    for _ in range(DRAWS):
+        counts.update(sampler.pick(1, weight=weight, no_repeat=False, **filters))
+    return counts
+
+def check_weights(df, failures):
+    sampler = sampling.MovieSampler(df)
+    filters = {"genre": "Drama"}
+    positions = sampler.candidates(**filters)
+
+    # A callable weight: picks land in proportion to it, and weight 0 is never picked
+    favourite = positions[0]
+    def weight(meta):
+        if meta["image"] == sampler.metadata[favourite]["image"]:
+            return 50.0
+        return 0.0 if meta["runtime"] is None else 1.0
+    weights = {i: weight(dict(sampler.metadata[i])) for i in positions}
+    counts = frequencies(sampler, weight, **filters)
+    if any(counts[sampler.labels[i]] for i, w in weights.items() if w == 0):
+        failures.append("weights: a film with weight 0 was picked")
+    share = counts[sampler.labels[favourite]] / DRAWS
+    expected = 50.0 / sum(weights.values())
+    if abs(share - expected) > 0.25 * expected:
+        failures.append(f"weights: the favoured film got {share:.3f} of picks, expected about {expected:.3f}")
+
+    # "rating" favours higher rated films, "oldest" the films at the end of the list
+    for name, value in (("rating", lambda i: sampler.ratings[i] if sampler.ratings[i] is not None else 2.5),
+                        ("oldest", lambda i: i)):
+        counts = frequencies(sampler, name, **filters)
+        picked_mean = sum(value(sampler.position[label]) * count for label, count in counts.items()) / DRAWS
+        uniform_mean = sum(value(i) for i in positions) / len(positions)
+        if picked_mean <= uniform_mean:
+            failures.append(f"weights: {name!r} picks average {picked_mean:.2f}, no higher than uniform ({uniform_mean:.2f})")
+
+def check_exhaustion(df, failures):
+    sampler = sampling.MovieSampler(df)
+    if sampler.pick(3, genre="Western") != []:
+        failures.append("exhaustion: a filter with no matches returned films")
+    pool = sampler.candidates(director="Director 4")
+    picked = sampler.pick(len(pool) + 10, director="Director 4")
+    if len(picked) != len(pool) or len(set(picked)) != len(picked):
+        failures.append(f"exhaustion: asking for more films than match gave {len(picked)}, expected {len(pool)}")
+    # Every match has been seen, so the next no-repeat pick starts over with all of them
+    again = sampler.pick(len(pool), director="Director 4")
+    if set(again) != set(picked):
+        failures.append(f"exhaustion: starting over gave {len(set(again))} of {len(pool)} films")
+    # A callable weight that rules out every film leaves nothing to pick, even after starting over
+    if sampler.pick(1, weight=lambda meta: 0.0, director="Director 4"):
+        failures.append("exhaustion: a pool whose weights are all 0 returned a film")
+
+def main():
+    random.seed(1)
+    config.PERSIST_CACHE = False
+    df = build_watchlist()
+    failures = []
+    for check in (check_filters, check_no_repeat, check_repeat, check_weights, check_exhaustion):
+        before = len(failures)
+        with contextlib.redirect_stdout(io.StringIO()):
+            check(df, failures)
+        print(f"{check.__name__[6:]:>12}: {'ok' if len(failures) == before else 'FAILED'}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Local stand-in for Letterboxd used by the benchmarks.
+Serves watchlist pages, film pages and posters rendered from the templates in fixtures/,
+which follow the markup the scraper parses on the real site.
+"""
+import io
+import os
+import re
+import json
+import gzip
+import time
+import hashlib
+import random
+import threading
+from string import Template
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PER_PAGE = 28 # Letterboxd shows 28 films per watchlist page
+
+GENRES = ["Drama", "Comedy", "Thriller", "Horror", "Documentary", "Romance", "Science Fiction", "Animation"]
+
+def load_template(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return Template(f.read())
+
+PAGE_TEMPLATE = load_template("watchlist_page.html")
+ITEM_TEMPLATE = load_template("watchlist_item.html")
+FILM_TEMPLATE = load_template("film_page.html")
+
+def film_info(film_id):
+    """Deterministic details for a synthetic film"""
+    return {
+        "film_id": film_id,
+        "name": f"Film {film_id}",
+        "slug": f"film-{film_id}",
+        "year": 1930 + film_id % 95,
+        "lid": f"{film_id:x}",
+    }
+
+def synthetic_watchlist(size, seed=0, pool=None):
+    """A list of `size` film IDs drawn from a pool, so lists from different seeds overlap"""
+    rng = random.Random(seed)
+    return rng.sample(range(1, (pool or size * 4) + 1), size)
+
+def render_watchlist_page(username, film_ids, page):
+    chunk = film_ids[(page - 1) * PER_PAGE:page * PER_PAGE]
+    items = "\n".join(ITEM_TEMPLATE.substitute(film_info(film_id)) for film_id in chunk)
+    pages = max(1, -(-len(film_ids) // PER_PAGE))
+    pagination = "".join(f'<li class="paginate-page"><a href="/{username}/watchlist/page/{n}/">{n}</a></li>' for n in range(1, pages + 1))
+    return PAGE_TEMPLATE.substitute(username=username, num_entries=len(film_ids), items=items, pagination=pagination)
+
+def render_film_page(film_id, base_url):
+    info = film_info(film_id)
+    json_ld = {
+        "@context": "http://schema.org",
+        "@type": "Movie",
+        "name": info["name"],
+        "url": f"{base_url}/film/{info['slug']}/",
+        "image": f"{base_url}/poster/{film_id}.jpg",
+        "director": [{"@type": "Person", "name": f"Director {film_id % 97}"}],
+        "genre": [GENRES[film_id % len(GENRES)], GENRES[(film_id // 3) % len(GENRES)]],
+        "releasedEvent": [{"@type": "PublicationEvent", "startDate": str(info["year"])}],
+        "aggregateRating": {"@type": "AggregateRating", "ratingValue": round(1.5 + (film_id % 35) / 10, 2), "ratingCount": film_id * 7 % 90000},
+        "actors": [{"@type": "Person", "name": f"Actor {film_id * i % 1000}"} for i in range(1, 16)],
+    }
+    return FILM_TEMPLATE.substitute(info, runtime=70 + film_id % 110, json_ld=json.dumps(json_ld, indent=1))
+
+def render_poster():
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (460, 690), (44, 52, 64)).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+class BenchServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512 # The default backlog of 5 drops connections under concurrent load
+
+class FakeLetterboxd:
+    """
+    Threaded HTTP server with configurable watchlists and latency.
+    error_rate answers that fraction of requests with a 503, and rate_limit answers requests
+    beyond that many per second with a 429 and Retry-After, like a throttling server would.
+    With etags, pages carry an ETag and a matching If-None-Match gets an empty 304; with
+    compress, HTML is gzipped for clients that accept it. bytes_sent counts body bytes as sent,
+    and latencies holds the seconds each request took, from its headers arriving to its body sent.
+    Watchlist URL: {base_url}/{username}/watchlist/page/{page}/
+    Film URL:      {base_url}/film/{lid}/   (stands in for https://boxd.it/{lid})
+    """
+
+    def __init__(self, watchlists=None, latency=0.0, error_rate=0.0, rate_limit=None, seed=0, etags=True, compress=True):
+        self.watchlists = watchlists or {}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.etags = etags
+        self.compress = compress
+        self.request_count = 0
+        self.bytes_sent = 0
+        self.status_counts = {}
+        self.latencies = []
+        self._rng = random.Random(seed)
+        self._window = []  # Arrival times within the last second, for rate_limit
+        self._lock = threading.Lock()
+        self._poster = render_poster()
+        self._server = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def watchlist_url(self):
+        """Drop-in replacement for random_movie.config.WATCHLIST_URL"""
+        return self.base_url + "/{}/watchlist/page/{}/"
+
+    def film_url(self, lid):
+        return f"{self.base_url}/film/{lid}/"
+
+    def fault(self):
+        """An injected (status, headers) for the next request, or None to serve it normally"""
+        with self._lock:
+            if self.rate_limit:
+                now = time.monotonic()
+                self._window = [t for t in self._window if now - t < 1.0]
+                if len(self._window) >= self.rate_limit:
+                    return 429, {"Retry-After": "1"}
+                self._window.append(now)
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return 503, {}
+        return None
+
+    def respond(self, path):
+        """Return (status, content type, body) for a request path"""
+        match = re.fullmatch(r"/([^/]+)/watchlist/page/(\d+)/", path)
+        if match and match.group(1) in self.watchlists:
+            html = render_watchlist_page(match.group(1), self.watchlists[match.group(1)], int(match.group(2)))
+            return 200, "text/html; charset=utf-8", html.encode()
+
+        match = re.fullmatch(r"/film/([0-9a-f]+)/", path)
+        if match:
+            return 200, "text/html; charset=utf-8", render_film_page(int(match.group(1), 16), self.base_url).encode()
+
+        if re.fullmatch(r"/poster/\d+\.jpg", path):
+            return 200, "image/jpeg", self._poster
+
+        return 404, "text/html", b"<html><body>Not found</body></html>"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, so connection pooling shows up in benchmarks
+            disable_nagle_algorithm = True # Headers and body go out in separate writes
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                start = time.perf_counter()
+                if fake.latency:
+                    time.sleep(fake.latency)
+                fault = fake.fault()
+                if fault:
+                    (status, headers), content_type, body = fault, "text/html", b"<html><body>Try again later</body></html>"
+                else:
+                    (status, content_type, body), headers = fake.respond(self.path.split("?")[0]), {}
+                if status == 200 and fake.etags:
+                    headers["ETag"] = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+                    if self.headers.get("If-None-Match") == headers["ETag"]:
+                        status, body = 304, b""
+                if body and fake.compress and content_type.startswith("text/") and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    headers["Content-Encoding"] = "gzip"
+                    body = gzip.compress(body, compresslevel=6)
+                with fake._lock:
+                    fake.request_count += 1
+                    fake.bytes_sent += len(body)
+                    fake.status_counts[status] = fake.status_counts.get(status, 0) + 1
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with fake._lock:
+                    fake.latencies.append(time.perf_counter() - start)
+
+        self._server = BenchServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
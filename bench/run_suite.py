@@ -0,0 +1,210 @@
+"""
+Offline benchmark suite: every fetch path and the parsers, against the local Letterboxd stand-in.
+Each benchmark runs in its own process so its peak RSS is its own. Reports the median time
+per run, p50/p95 latency of the individual requests (pages, for the parsers) over every run,
+requests per second and errors seen by the stand-in, and peak RSS. --compare refuses a
+baseline saved with different workload settings.
+
+    python bench/run_suite.py
+    python bench/run_suite.py --size 2000 --latency 0.05 --error-rate 0.02
+    python bench/run_suite.py --parse-processes 4   # parse fetched pages in worker processes
+    python bench/run_suite.py --save baseline.json
+    python bench/run_suite.py --compare baseline.json   # exits 1 on a regression beyond --tolerance
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import resource
+import subprocess
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from random_movie import config, core, sampling
+from fake_letterboxd import FakeLetterboxd, synthetic_watchlist, render_watchlist_page, render_film_page
+
+def percentile(values, fraction):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+def reset_caches():
+    core.watchlists.clear()
+    core.metadata_cache.clear()
+    sampling.samplers.clear()
+    core.host_limiters.clear()
+    core.revalidated_users.clear()
+
+def network_benchmark(args, run, prepare=None):
+    """Time `run()` against a fresh stand-in, clearing the caches (and calling `prepare()`) before each run"""
+    usernames = [f"user{i}" for i in range(args.users)]
+    lists = {user: synthetic_watchlist(args.size, seed=i, pool=args.size * 2) for i, user in enumerate(usernames)}
+    timings = []
+    latencies = []
+    requests_made = errors = 0
+    with FakeLetterboxd(lists, latency=args.latency, error_rate=args.error_rate) as fake:
+        config.WATCHLIST_URL = fake.watchlist_url
+        config.FILM_URL = fake.base_url + "/film/{}/"
+        for _ in range(args.repeat):
+            reset_caches()
+            state = prepare(usernames) if prepare else None
+            before = fake.request_count, fake.status_counts.get(503, 0), len(fake.latencies)
+            start = time.perf_counter()
+            run(usernames, state)
+            timings.append(time.perf_counter() - start)
+            requests_made += fake.request_count - before[0]
+            errors += fake.status_counts.get(503, 0) - before[1]
+            latencies += fake.latencies[before[2]:]
+    return {"timings": timings, "latencies": latencies, "requests": requests_made, "errors": errors,
+            "rps": requests_made / sum(timings)}
+
+def parse_benchmark(args, parse, pages):
+    """Time `parse(page)` over a batch of pages; each batch is one run, each page one latency"""
+    timings = []
+    latencies = []
+    for _ in range(args.repeat):
+        for html in pages:
+            start = time.perf_counter()
+            parse(html)
+            latencies.append(time.perf_counter() - start)
+        timings.append(sum(latencies[-len(pages):]))
+    return {"timings": timings, "latencies": latencies, "requests": 0, "errors": 0,
+            "pages_per_s": len(pages) * len(timings) / sum(timings)}
+
+def watchlist_pages():
+    film_ids = synthetic_watchlist(28 * 40, seed=1)
+    return [render_watchlist_page("synthetic", film_ids, page) for page in range(1, 41)]
+
+def film_pages():
+    return [render_film_page(film_id, "https://letterboxd.com") for film_id in synthetic_watchlist(200, seed=1)]
+
+METADATA_FILMS = 300 # Films per fetch_metadata_background run
+
+def metadata_watchlist(usernames):
+    return core.fetch_watchlist(usernames[0]).head(METADATA_FILMS).copy()
+
+BENCHMARKS = {
+    "fetch_watchlist": lambda args: network_benchmark(
+        args, lambda users, _: core.fetch_watchlist(users[0])),
+    "fetch_watchlist[async]": lambda args: network_benchmark(
+        args, lambda users, _: core.fetch_watchlist(users[0], engine="async")),
+    "fetch_watchlist_sequential": lambda args: network_benchmark(
+        args, lambda users, _: core.fetch_watchlist_sequential(users[0])),
+    "fetch_multiple_watchlists": lambda args: network_benchmark(
+        args, lambda users, _: core.fetch_multiple_watchlists(users)),
+    "fetch_metadata_background": lambda args: network_benchmark(
+        args, lambda users, df: sampling.fetch_metadata_background(df, workers=8, prefetch_posters=False),
+        prepare=metadata_watchlist),
+    "parse_watchlist_page": lambda args: parse_benchmark(args, core.parse_watchlist_page, watchlist_pages()),
+    "parse_watchlist_page[bs4]": lambda args: parse_benchmark(args, core.parse_watchlist_page_bs4, watchlist_pages()),
+    "parse_film_metadata": lambda args: parse_benchmark(args, core.parse_film_metadata, film_pages()),
+}
+
+def available(name):
+    return not name.endswith("[async]") or core.httpx is not None
+
+def run_child(name, args):
+    """Run one benchmark in this process and print its result as JSON"""
+    config.PERSIST_CACHE = False
+    config.PARSE_PROCESSES = args.parse_processes
+    config.RATE_LIMIT = None # The local stand-in only throttles through --error-rate
+    core.preload_modules(engine="async") # Import time is bench_startup.py's job, not the first run's
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = BENCHMARKS[name](args)
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(result))
+
+def run_isolated(name, argv):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), *argv, "--child", name],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def summarize(result):
+    """Median run time, and p50/p95 over every request (or parsed page) of every run"""
+    timings = result.pop("timings")
+    latencies = result.pop("latencies") or [0.0] # A run served entirely from cache makes no requests
+    result["run_ms"] = percentile(timings, 0.5) * 1000
+    result["p50_ms"] = percentile(latencies, 0.5) * 1000
+    result["p95_ms"] = percentile(latencies, 0.95) * 1000
+    return result
+
+# Options that change the work a benchmark does, so results are only comparable when they match
+WORKLOAD_SETTINGS = ("users", "size", "latency", "error_rate", "parse_processes")
+
+def settings_mismatch(args, settings):
+    """Workload settings that differ between this run and a saved baseline's"""
+    return [f"--{key.replace('_', '-')} {settings.get(key)} (baseline) vs {getattr(args, key)}"
+            for key in WORKLOAD_SETTINGS if settings.get(key) != getattr(args, key)]
+
+def compare(results, baseline, tolerance):
+    """Benchmarks whose run time, p50 latency or peak RSS grew by more than the tolerance"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ("run_ms", "p50_ms", "peak_rss_mb"):
+            before, after = baseline[name][metric], result[metric]
+            if before and after > before * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before:.1f} -> {after:.1f} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5, help="users in the group for fetch_multiple_watchlists")
+    parser.add_argument("--size", type=int, default=1000, help="films per watchlist")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of responses that are 503s")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark")
+    parser.add_argument("--parse-processes", type=int, default=0, help="PARSE_PROCESSES for the fetch benchmarks")
+    parser.add_argument("--only", action="append", help="run just this benchmark (repeatable)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON from --save to check against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown/growth before it counts as a regression")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child, args)
+
+    argv = ["--users", str(args.users), "--size", str(args.size), "--latency", str(args.latency),
+            "--error-rate", str(args.error_rate), "--repeat", str(args.repeat), "--parse-processes", str(args.parse_processes)]
+    names = [name for name in (args.only or BENCHMARKS) if available(name)]
+    if args.compare:
+        with open(args.compare) as f:
+            saved = json.load(f)
+        mismatch = settings_mismatch(args, saved.get("settings", {}))
+        if mismatch:
+            parser.error(f"{args.compare} was saved with different settings: {'; '.join(mismatch)}")
+    print(f"{args.users} users x {args.size} films, {args.latency * 1000:.0f} ms latency, "
+          f"{args.error_rate:.0%} errors, {args.repeat} runs each")
+    print(f"{'benchmark':<28}{'run ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'req/s':>9}{'requests':>10}{'errors':>8}{'peak RSS':>11}")
+    results = {}
+    for name in names:
+        result = results[name] = summarize(run_isolated(name, argv))
+        rate = f"{result['rps']:.0f}" if "rps" in result else f"{result['pages_per_s']:.0f}p"
+        print(f"{name:<28}{result['run_ms']:>10.1f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{rate:>9}"
+              f"{result['requests']:>10}{result['errors']:>8}{result['peak_rss_mb']:>8.0f} MB")
+    print("(run ms: median time per run; p50/p95: per request, or per page parsed; p = pages parsed per second rather than requests)")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+    if args.compare:
+        regressions = compare(results, saved["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""
+Letterboxd random movie picker, in layers that can each be imported on their own:
+
+- config: settings, read by the other modules each time they are used
+- core: fetching, parsing and caching watchlists, intersections, film details and posters
+- sampling: filtered and weighted random picks, and the metadata fetches behind them
+- server: the headless JSON API (`python -m random_movie serve`)
+- gui: the Tk window (`python -m random_movie`), the only module that imports tkinter
+"""
+from . import config
+from .core import fetch_watchlist, fetch_multiple_watchlists, export_cache, import_cache, warm_cache
+from .sampling import MovieSampler, pick_movies
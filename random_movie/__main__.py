@@ -0,0 +1,22 @@
+import sys
+import multiprocessing
+
+# Absolute imports, so PyInstaller can build the app from this file as its script
+from random_movie.core import cache_main, warm_main
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support() # Lets PyInstaller builds start parse pool workers
+
+if __name__ == "__main__" and sys.argv[1:2] == ["serve"]:
+    from random_movie.server import serve_main
+    serve_main(sys.argv[2:])
+
+elif __name__ == "__main__" and sys.argv[1:2] in (["export"], ["import"]):
+    cache_main(sys.argv[1], sys.argv[2:])
+
+elif __name__ == "__main__" and sys.argv[1:2] == ["warm"]:
+    warm_main(sys.argv[2:])
+
+elif __name__ == "__main__":
+    from random_movie.gui import main
+    main()
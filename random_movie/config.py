@@ -0,0 +1,61 @@
+"""
+Settings for every layer of the picker. The other modules read them from here each time they
+are used, so setting one at runtime (e.g. `config.PERSIST_CACHE = False`) takes effect straight away.
+"""
+import os
+
+WATCHLIST_URL = "https://letterboxd.com/{}/watchlist/page/{}/"
+FILM_URL = "https://boxd.it/{}"
+DEBUG = False 
+SAVE_WATCHLISTS = False # Needs to be false for app packaging
+FETCH_ENGINE = "threads" # "threads" (requests + thread pool) or "async" (one pooled httpx client, needs httpx)
+ASYNC_MAX_CONNECTIONS = 20 # Global limit on in-flight requests for the async engine
+PREPICK_COUNT = 3 # Random films picked ahead of time so their metadata and poster are ready for the next click
+UI_POLL_MS = 16 # How often the GUI drains worker messages (~60 fps)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8080
+METRICS_ENABLED = False # Record stage timings, cache hits and request counters (always on in server mode)
+METRICS_LOG = None # Path of a JSON-lines file that gets a metrics snapshot after every pick
+STREAMING_INTERSECTION = True # Intersect groups by streaming pages against the smallest watchlist
+PARSER_BACKEND = "auto" # "bs4", "selectolax", "regex", or "auto" (selectolax if installed, else regex)
+HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Connection": "keep-alive"
+}
+# Posters come from the image CDN; webp is smaller than JPEG and Pillow decodes both
+POSTER_HEADERS = {"User-Agent": HEADERS["User-Agent"], "Accept": "image/webp,image/jpeg,image/*;q=0.8"}
+METADATA_BATCH = 200 # Fetched film details written back to a watchlist at a time...
+METADATA_BATCH_SECONDS = 1.0 # ...or at least this often while fetches are coming in
+
+# Every Letterboxd request goes through a per-host limiter with retries (see http_get)
+REQUEST_TIMEOUT = (5, 20) # (connect, read) seconds
+MAX_RETRIES = 4 # Further attempts for throttled (429), 5xx, timed out and dropped requests
+BACKOFF_BASE = 0.5 # Seconds before the first retry, doubling on each further attempt (with jitter)
+BACKOFF_MAX = 30 # Longest wait between attempts, including a server's Retry-After
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT = 20.0 # Starting requests/second per host, or None for no rate limit
+MAX_RATE_LIMIT = 50.0 # Healthy responses raise the rate up to this; throttling halves it
+RATE_BURST = 10 # Requests a host can be sent back to back before the rate applies
+HOST_ALIASES = {"boxd.it": "letterboxd.com"} # Hosts that redirect every request elsewhere share that host's limiter
+FETCH_WORKERS = 16 # Threads shared by every watchlist page fetch, across all users at once
+PARSE_PROCESSES = 0 # Parse pages in this many worker processes (None = one per core, 0 = on the fetching thread)
+MAX_HOST_CONCURRENCY = 16 # Ceiling for the adaptive number of requests in flight per host
+LATENCY_TOLERANCE = 2.0 # Stop adding concurrency once latency exceeds this multiple of the fastest seen
+COMPACT_STORAGE = True # int32 film IDs, categorical years and one shared copy of each string across watchlists
+
+# Persistent cache (kept in the home directory so it also works for the packaged app)
+PERSIST_CACHE = True
+INCREMENTAL_SYNC = True # Refresh changed watchlists by fetching only the new pages at the front
+WATCHLIST_FRESH_FOR = 0 # Seconds after a stored watchlist was fetched or checked during which it is used without checking Letterboxd
+CACHE_DIR = os.environ.get("RANDOM_MOVIE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".random_movie_picker"))
+CACHE_DB = os.path.join(CACHE_DIR, "cache.sqlite3")
+METADATA_TTL = 30 * 24 * 60 * 60 # Seconds before stored film metadata is fetched again
+POSTER_DIR = os.path.join(CACHE_DIR, "posters")
+POSTER_SIZE = (230, 345) # Posters are stored already resized to the size they are displayed at
+POSTER_CACHE_BYTES = 100 * 1024 * 1024 # Least recently shown posters are evicted beyond this
+EXPORT_BATCH = 1000 # Metadata records per batch when exporting or importing the cache
+HTTP_CACHE = True # Revalidate pages fetched before with ETag/Last-Modified and answer 304s from the stored copy
+HTTP_CACHE_DIR = os.path.join(CACHE_DIR, "http")
+HTTP_CACHE_BYTES = 100 * 1024 * 1024 # Gzipped page bodies kept for revalidation; least recently used go first
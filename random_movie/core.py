@@ -0,0 +1,2578 @@
+"""
+Fetching, parsing and caching: watchlists, group intersections, film details, posters and
+exports of the persistent cache, plus the `warm`, `export` and `import` commands.
+"""
+import sys
+import sqlite3
+import importlib
+import importlib.util
+import threading
+import multiprocessing
+import math, io, os, re, json, gzip, zlib, time, html, random, bisect, hashlib, itertools, functools, contextlib
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from . import config
+
+class LazyModule:
+    """
+    Stands in for a heavy module and imports it on first attribute access, so importing
+    random_movie, and opening the window, doesn't wait for pandas or the network stack
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+def optional_module(name):
+    """A LazyModule for an optional dependency, or None if it isn't installed"""
+    return LazyModule(name) if importlib.util.find_spec(name.split(".")[0]) else None
+
+pd = LazyModule("pandas")
+asyncio = LazyModule("asyncio")  # Only the async fetch engine uses it
+requests = LazyModule("requests")
+httpx = optional_module("httpx")  # Optional: only needed for the async fetch engine
+pa = optional_module("pyarrow")  # Optional: only needed for Parquet cache exports
+pq = optional_module("pyarrow.parquet")
+
+@functools.cache
+def selectolax_parser():
+    """selectolax's HTML parser class (Lexbor where available), or None if it isn't installed"""
+    try:
+        from selectolax.lexbor import LexborHTMLParser  # Optional: fastest parser backend
+        return LexborHTMLParser
+    except ImportError:
+        try:
+            from selectolax.parser import HTMLParser  # selectolax < 1.0
+            return HTMLParser
+        except ImportError:
+            return None
+
+def preload_modules(engine=None):
+    """Import the fetch and parse stack ahead of the first pick, e.g. once the window is up"""
+    pd._load()
+    requests._load()
+    if (engine or config.FETCH_ENGINE) == "async" and httpx is not None:
+        asyncio._load()
+        httpx._load()
+    if parser_backend() == "bs4":
+        import bs4  # noqa: F401
+    from PIL import Image  # noqa: F401
+
+WATCHLIST_COLUMNS = ["Name", "Year", "Slug", "Film ID", "LID", "Letterboxd URI"]
+# Columns film details are written to: the slim record, "|"-joined directors and genres, rating and runtime
+METADATA_COLUMNS = {"Metadata": object, "Directors": object, "Genres": object, "Rating": "Float64", "Runtime": "Int32"}
+
+# Dict mapping (multi-)username keys to their (intersected) watchlists
+watchlists = {}
+# Held while a watchlist or intersection is stored or replaced, or the dict is scanned
+watchlists_lock = threading.RLock()
+
+# Process-wide connection pool used by the headless server
+shared_session = None
+shared_session_lock = threading.Lock()
+
+# Film metadata shared by every watchlist, keyed by slug: {slug: (slim metadata, fetched_at)}
+metadata_cache = {}
+# Held while film details are written to (or read from) a watchlist, so readers only see whole batches
+metadata_lock = threading.Lock()
+
+# One copy of every title, slug, URI, director and genre string, shared by all cached watchlists
+shared_strings = {}
+
+# Running size of the poster cache directory, computed on first use
+poster_cache_bytes = None
+poster_cache_lock = threading.Lock()
+# The same for the HTTP cache directory
+http_cache_bytes = None
+http_cache_lock = threading.Lock()
+
+# Usernames whose disk-cached watchlist has already been checked this session
+revalidated_users = set()
+revalidation_lock = threading.Lock()
+
+# Request limiters per host name
+host_limiters = {}
+host_limiters_lock = threading.Lock()
+
+# Requests http_get may still send before refusing (None = no limit), for `random_movie warm --max-requests`
+request_budget = None
+request_budget_lock = threading.Lock()
+
+# Page fetch pool shared by all watchlist downloads, with one session per pool thread
+fetch_pool = None
+fetch_pool_lock = threading.Lock()
+fetch_sessions = threading.local()
+
+# Watchlist pages being downloaded, per username (see WatchlistDownload)
+watchlist_downloads = {}
+watchlist_downloads_lock = threading.Lock()
+
+# Worker processes that parse downloaded pages when PARSE_PROCESSES is set
+parse_pool = None
+parse_pool_lock = threading.Lock()
+
+class Metrics:
+    """
+    Process-wide counters, gauges and histograms, all keyed by name plus optional labels.
+    Stages are timed with `with metrics.stage("name"):`, which also opens a span through
+    span_hook when one is set: any callable taking (name, attributes=...) and returning a
+    context manager, such as an OpenTelemetry tracer's start_as_current_span.
+    Every call returns straight away while the metrics are disabled.
+    """
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.span_hook = None
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = defaultdict(float)
+            self.gauges = defaultdict(float)
+            self.histograms = {}  # key -> [bucket counts, count, sum, max]
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name, tuple(sorted(labels.items()))] += value
+
+    def gauge(self, name, delta, **labels):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[name, tuple(sorted(labels.items()))] += delta
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(self.BUCKETS), 0, 0.0, 0.0]
+            histogram[0][bisect.bisect_left(self.BUCKETS, value)] += 1
+            histogram[1] += 1
+            histogram[2] += value
+            histogram[3] = max(histogram[3], value)
+
+    def stage(self, name, **labels):
+        """Context manager timing one stage into the stage_seconds histogram"""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._stage(name, labels)
+
+    @contextlib.contextmanager
+    def _stage(self, name, labels):
+        span = self.span_hook(name, attributes=labels) if self.span_hook else contextlib.nullcontext()
+        with span:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.observe("stage_seconds", time.perf_counter() - start, stage=name, **labels)
+
+    def snapshot(self):
+        """Everything recorded so far as plain JSON-friendly data"""
+        def label_text(labels):
+            return ",".join(f"{key}={value}" for key, value in labels)
+        with self.lock:
+            return {
+                "counters": {f"{name}{{{label_text(labels)}}}": value for (name, labels), value in self.counters.items()},
+                "gauges": {f"{name}{{{label_text(labels)}}}": value for (name, labels), value in self.gauges.items()},
+                "histograms": {
+                    f"{name}{{{label_text(labels)}}}": {"count": count, "sum": total, "max": peak, "mean": total / count if count else 0.0}
+                    for (name, labels), (_, count, total, peak) in self.histograms.items()
+                },
+            }
+
+    def prometheus_text(self, prefix="random_movie_"):
+        """The Prometheus text exposition format"""
+        def escape(value):
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        def label_text(labels, extra=()):
+            pairs = [f'{key}="{escape(value)}"' for key, value in (*labels, *extra)]
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+        lines = []
+        with self.lock:
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, _ in values}):
+                    lines.append(f"# TYPE {prefix}{name} {kind}")
+                    lines.extend(f"{prefix}{name}{label_text(labels)} {value:g}" for (n, labels), value in values.items() if n == name)
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                for (n, labels), (buckets, count, total, _) in self.histograms.items():
+                    if n != name:
+                        continue
+                    for bound, cumulative in zip(self.BUCKETS, itertools.accumulate(buckets)):
+                        le = "+Inf" if bound == math.inf else f"{bound:g}"
+                        lines.append(f"{prefix}{name}_bucket{label_text(labels, [('le', le)])} {cumulative}")
+                    lines.append(f"{prefix}{name}_count{label_text(labels)} {count}")
+                    lines.append(f"{prefix}{name}_sum{label_text(labels)} {total:g}")
+        return "\n".join(lines) + "\n"
+
+    def log_json(self, event, path=None, **fields):
+        """Append a snapshot to the JSON-lines metrics log, if there is one"""
+        path = path or config.METRICS_LOG
+        if not (self.enabled and path):
+            return
+        record = {"time": time.time(), "event": event, **fields, **self.snapshot()}
+        with self.lock, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+metrics = Metrics(config.METRICS_ENABLED)
+
+def timed(stage):
+    """Decorator recording every call of a function as a metrics stage"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            with metrics.stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class Superseded(Exception):
+    """Raised by a caller that has given up on its work, e.g. a pick replaced by a newer one"""
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers asking for a key that is already being
+    worked on wait for that call and share its result or exception. Nothing is kept once the
+    call returns, so the function should check the caches itself. If the caller running it
+    was superseded, the next waiter runs it again instead of inheriting the cancellation.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Future of the call in flight
+
+    def do(self, key, func, *args, **kwargs):
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = self._calls[key] = Future()
+            if leader:
+                break
+            metrics.count("coalesced_total", kind=self.kind)
+            try:
+                return future.result()
+            except Superseded:
+                continue
+        
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def do_many(self, keys, func, *args, **kwargs):
+        """
+        do() for several keys at once: func(keys, *args, **kwargs) is called once with the keys
+        nobody else is working on and returns {key: result}, while keys already in flight are
+        waited for. Returns {key: result} for every key.
+        """
+        led, waiting = {}, {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                if key in self._calls:
+                    waiting[key] = self._calls[key]
+                else:
+                    led[key] = self._calls[key] = Future()
+        
+        results = {}
+        try:
+            if led:
+                results = func(list(led), *args, **kwargs)
+                for key, future in led.items():
+                    future.set_result(results[key])
+        except BaseException as e:
+            for future in led.values():
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                for key in led:
+                    del self._calls[key]
+        
+        for key, future in waiting.items():
+            metrics.count("coalesced_total", kind=self.kind)
+            try:
+                results[key] = future.result()
+            except Superseded:
+                results[key] = self.do(key, lambda key: func([key], *args, **kwargs)[key], key)
+        return {key: results[key] for key in keys}
+
+watchlist_flights = SingleFlight("watchlist")
+intersection_flights = SingleFlight("intersection")
+metadata_flights = SingleFlight("metadata")
+poster_flights = SingleFlight("poster")
+
+def movie_record(attrs):
+    """Build a watchlist row from the data-* attributes of a griditem's poster component"""
+    # Extract title and year from data-item-full-display-name
+    full_name = attrs.get("data-item-full-display-name") or ""
+    
+    # Parse title and year (format: "Title (Year)")
+    if "(" in full_name and full_name.endswith(")"):
+        title = full_name.rsplit(" (", 1)[0]
+        year = full_name.rsplit(" (", 1)[1][:-1]  # Remove the closing )
+    else:
+        title = full_name
+        year = "Unknown"
+    
+    # Extract other attributes
+    slug = attrs.get("data-item-slug") or ""
+    film_id = attrs.get("data-film-id") or ""
+    
+    # Parse the postered identifier JSON to get lid
+    postered_identifier = attrs.get("data-postered-identifier") or ""
+    lid = ""
+    if postered_identifier:
+        try:
+            identifier_data = json.loads(postered_identifier)
+            lid = identifier_data.get("lid", "")
+        except:
+            lid = ""
+    
+    # Create full Letterboxd URI
+    letterboxd_uri = config.FILM_URL.format(lid) if lid else ""
+    
+    return {
+        "Name": title,
+        "Year": year,
+        "Slug": slug,
+        "Film ID": film_id,
+        "LID": lid,
+        "Letterboxd URI": letterboxd_uri,
+    }
+
+def shared_string(value):
+    """The process-wide copy of a string, so equal strings in different watchlists are stored once"""
+    return shared_strings.setdefault(value, value) if isinstance(value, str) else value
+
+def compact_watchlist(df):
+    """
+    Store a watchlist in the compact layout: Film ID as int32 (0 when missing), Year as a
+    categorical and the remaining strings swapped for their shared copies. Every cached
+    watchlist and intersection containing a film then points at the same string objects,
+    so an intersection costs a few bytes per row rather than a copy of every title and URI.
+    """
+    if not config.COMPACT_STORAGE:
+        return df
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column == "Film ID":
+            values = pd.to_numeric(values, errors="coerce").fillna(0).astype("int32")
+        elif column == "Year":
+            values = pd.Series([shared_string(str(v)) for v in values], index=df.index, dtype="category")
+        elif column in WATCHLIST_COLUMNS:
+            values = pd.Series([shared_string(v) for v in values], index=df.index, dtype=object)
+        columns[column] = values
+    compact = pd.DataFrame(columns, index=df.index)
+    compact.attrs.update(df.attrs)
+    return compact
+
+def watchlist_frame(movies):
+    """Build a watchlist DataFrame from parsed movie dicts (or rows in column order)"""
+    return compact_watchlist(pd.DataFrame(movies, columns=WATCHLIST_COLUMNS))
+
+def parse_watchlist_page_bs4(html_text, page=1):
+    """Reference parser: BeautifulSoup over the whole page"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html_text, "html.parser")
+
+    # Only page 1 is needed for the count, but every page carries it
+    total_entries = None
+    watchlist_content = soup.find("div", {"class": "js-watchlist-content"})
+    if watchlist_content and watchlist_content.get("data-num-entries"):
+        total_entries = int(watchlist_content.get("data-num-entries"))
+
+    movies = soup.find_all("li", attrs={"class": "griditem"})
+    
+    page_movies = []
+    # Extract movie information from each griditem
+    for movie in movies:
+        try:
+            react_component = movie.find("div", class_="react-component")
+            if react_component:
+                page_movies.append(movie_record(react_component.attrs))
+        except Exception as e:
+            if config.DEBUG:
+                print(f"Error parsing movie on page {page}: {e}")
+            continue
+    
+    return page_movies, total_entries
+
+def parse_watchlist_page_selectolax(html_text, page=1):
+    """Fast parser: selectolax CSS selectors"""
+    tree = selectolax_parser()(html_text)
+
+    total_entries = None
+    watchlist_content = tree.css_first("div.js-watchlist-content")
+    if watchlist_content and watchlist_content.attributes.get("data-num-entries"):
+        total_entries = int(watchlist_content.attributes["data-num-entries"])
+
+    page_movies = []
+    for movie in tree.css("li.griditem"):
+        react_component = movie.css_first("div.react-component")
+        if react_component:
+            page_movies.append(movie_record(react_component.attributes))
+    return page_movies, total_entries
+
+# Patterns for the regex parser, which only looks at the few tags the scraper needs
+GRIDITEM_RE = re.compile(r"""<li\b[^>]*\bclass\s*=\s*["'](?:[^"']*\s)?griditem(?:\s[^"']*)?["'][^>]*>""", re.I)
+REACT_COMPONENT_RE = re.compile(r"""<div\b[^>]*\bclass\s*=\s*["'](?:[^"']*\s)?react-component(?:\s[^"']*)?["'][^>]*>""", re.I)
+WATCHLIST_CONTENT_RE = re.compile(r"""<div\b[^>]*\bclass\s*=\s*["'](?:[^"']*\s)?js-watchlist-content(?:\s[^"']*)?["'][^>]*>""", re.I)
+ATTRIBUTE_RE = re.compile(r"""([^\s"'<>/=]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))""")
+RUNTIME_RE = re.compile(r"""(\d+)(?:&nbsp;|\s|\xa0)+mins?\b""")
+JSON_LD_RE = re.compile(r"""<script\b[^>]*\btype\s*=\s*["']application/ld\+json["'][^>]*>(.*?)</script>""", re.I | re.S)
+
+def tag_attributes(tag):
+    """Attribute dict of a single start tag, with entities decoded"""
+    return {match.group(1).lower(): html.unescape(next(v for v in match.groups()[1:] if v is not None))
+            for match in ATTRIBUTE_RE.finditer(tag)}
+
+def parse_watchlist_page_regex(html_text, page=1):
+    """Fast parser: regexes over the griditem start tags, no DOM is built"""
+    total_entries = None
+    watchlist_content = WATCHLIST_CONTENT_RE.search(html_text)
+    if watchlist_content:
+        num_entries = tag_attributes(watchlist_content.group(0)).get("data-num-entries")
+        if num_entries:
+            total_entries = int(num_entries)
+
+    page_movies = []
+    griditems = list(GRIDITEM_RE.finditer(html_text))
+    for i, movie in enumerate(griditems):
+        # The poster component must sit inside this griditem, i.e. before the next one starts
+        end = griditems[i + 1].start() if i + 1 < len(griditems) else len(html_text)
+        react_component = REACT_COMPONENT_RE.search(html_text, movie.end(), end)
+        if react_component:
+            page_movies.append(movie_record(tag_attributes(react_component.group(0))))
+    return page_movies, total_entries
+
+def parser_backend(backend=None):
+    """Resolve PARSER_BACKEND (or an explicit backend) to the backend that will be used"""
+    backend = backend or config.PARSER_BACKEND
+    if backend == "auto":
+        return "selectolax" if selectolax_parser() is not None else "regex"
+    if backend == "selectolax" and selectolax_parser() is None:
+        return "regex"
+    return backend
+
+WATCHLIST_PARSERS = {
+    "bs4": parse_watchlist_page_bs4,
+    "selectolax": parse_watchlist_page_selectolax,
+    "regex": parse_watchlist_page_regex,
+}
+
+@timed("parse_watchlist_page")
+def parse_watchlist_page(html_text, page=1, backend=None):
+    """Parse a watchlist page into (movies, total entries); total is None if the page has no count"""
+    backend = parser_backend(backend)
+    if backend != "bs4":
+        try:
+            page_movies, total_entries = WATCHLIST_PARSERS[backend](html_text, page)
+            # Fall back to BeautifulSoup if the fast path clearly missed the films or the count
+            missed_movies = not page_movies and "griditem" in html_text
+            missed_count = total_entries is None and "data-num-entries" in html_text
+            if not (missed_movies or missed_count):
+                return page_movies, total_entries
+        except Exception as e:
+            if config.DEBUG:
+                print(f"{backend} parser failed on page {page}, falling back to BeautifulSoup: {e}")
+    return parse_watchlist_page_bs4(html_text, page)
+
+class FetchError(Exception):
+    """A request that could not be completed, even after retrying"""
+
+class RequestBudgetExhausted(FetchError):
+    """request_budget has been used up, so no more requests are sent"""
+
+def spend_request():
+    """Take one request from request_budget, raising RequestBudgetExhausted when none are left"""
+    global request_budget
+    if request_budget is None:
+        return
+    with request_budget_lock:
+        if request_budget <= 0:
+            raise RequestBudgetExhausted("The request budget has been used up")
+        request_budget -= 1
+
+class HostLimiter:
+    """
+    Token bucket and adaptive concurrency limit for one host.
+    Healthy responses raise the request rate (quickly until the host first throttles us,
+    gently after that) and the number of requests allowed in flight; throttling and server
+    errors halve them (at most once a second), rising latency trims concurrency, and a
+    Retry-After header pauses the host for every caller.
+    """
+
+    def __init__(self, host=""):
+        self.host = host
+        self.rate = config.RATE_LIMIT
+        self.slow_start = True  # Ramp the rate up multiplicatively until the first throttle
+        self.tokens = config.RATE_BURST
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.limit = config.MAX_HOST_CONCURRENCY / 2
+        self.in_flight = 0
+        self.fastest = None  # Lowest latency seen
+        self.latency = None  # Moving average
+        self.condition = threading.Condition()
+
+    def reserve(self):
+        """Take a token, returning how many seconds to wait before sending"""
+        with self.condition:
+            now = time.monotonic()
+            wait = max(0.0, self.paused_until - now)
+            if self.rate is None:
+                return wait
+            self.tokens = min(config.RATE_BURST, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1  # Callers queue up by going into debt
+            return max(wait, -self.tokens / self.rate)
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        time.sleep(self.reserve())
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def record(self, latency=None, throttled=False, retry_after=None):
+        """Adapt to a response: its latency if it succeeded, or None for a failure"""
+        with self.condition:
+            now = time.monotonic()
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            if latency is None:
+                # Requests in flight all fail together, so only back off once per second
+                if now - self.last_decrease >= 1:
+                    self.last_decrease = now
+                    self.limit = max(1.0, self.limit / 2)
+                    if throttled and self.rate is not None:
+                        self.rate = max(1.0, self.rate / 2)
+                        self.slow_start = False
+                return
+            
+            self.fastest = latency if self.fastest is None else min(self.fastest, latency)
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if self.latency <= config.LATENCY_TOLERANCE * self.fastest:
+                self.limit = min(config.MAX_HOST_CONCURRENCY, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(1.0, self.limit - 1 / self.limit)  # Requests are queueing at the server
+            if self.rate is not None:
+                self.rate = min(config.MAX_RATE_LIMIT, self.rate * 1.05 if self.slow_start else self.rate + 2 / self.rate)
+            self.condition.notify_all()
+
+def host_limiter(url):
+    """The limiter of the host a URL's request ends up at, e.g. letterboxd.com for a boxd.it link"""
+    host = urlparse(url).netloc
+    host = config.HOST_ALIASES.get(host, host)
+    with host_limiters_lock:
+        if host not in host_limiters:
+            host_limiters[host] = HostLimiter(host)
+        return host_limiters[host]
+
+def retry_after_seconds(response):
+    """Seconds asked for by a Retry-After header (delay or HTTP date), or None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(0.0, seconds), config.BACKOFF_MAX)
+
+def record_request(host, start, response=None):
+    """Request, byte and latency metrics for one attempt (response is None if it failed outright)"""
+    if not metrics.enabled:
+        return
+    metrics.count("http_requests_total", host=host, status=response.status_code if response is not None else "error")
+    metrics.observe("http_request_seconds", time.monotonic() - start, host=host)
+    if response is not None:
+        received = wire_bytes(response)
+        metrics.count("http_bytes_received_total", received, host=host)
+        if len(response.content) > received:
+            metrics.count("http_bytes_saved_total", len(response.content) - received, host=host, reason="compression")
+
+def wire_bytes(response):
+    """Bytes a response took on the wire, before decompression (its decoded size if unknown)"""
+    downloaded = getattr(response, "num_bytes_downloaded", None)  # httpx
+    if downloaded is None:
+        try:
+            downloaded = response.raw.tell()  # urllib3 counts what it read off the socket
+        except (AttributeError, OSError):
+            pass
+    return downloaded or len(response.content)
+
+@functools.cache
+def accept_encoding():
+    """Content codings requests can decode: gzip and deflate, plus br and zstd when brotli and zstandard are installed"""
+    from urllib3.util.request import ACCEPT_ENCODING
+    return ACCEPT_ENCODING
+
+def http_cache_path(url):
+    return os.path.join(config.HTTP_CACHE_DIR, f"{hashlib.sha1(url.encode()).hexdigest()}.gz")
+
+def load_http_entry(url):
+    """The stored copy of a URL's last 200 response, {"etag", "last_modified", "encoding", "body"}, or None"""
+    try:
+        with open(http_cache_path(url), "rb") as f:
+            header, _, body = gzip.decompress(f.read()).partition(b"\n")
+        entry = json.loads(header)
+    except (OSError, EOFError, ValueError, zlib.error):
+        return None
+    if entry.get("url") != url:
+        return None
+    entry["body"] = body
+    return entry
+
+def save_http_entry(url, response):
+    """Store a 200 response that carries a validator, or drop the stored copy once it no longer does"""
+    global http_cache_bytes
+    path = http_cache_path(url)
+    etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+    if not (etag or last_modified) or "no-store" in response.headers.get("Cache-Control", ""):
+        with contextlib.suppress(OSError):
+            os.remove(path)
+        return
+    header = json.dumps({"url": url, "etag": etag, "last_modified": last_modified, "encoding": response.encoding})
+    data = gzip.compress(header.encode() + b"\n" + response.content, compresslevel=5)
+    try:
+        os.makedirs(config.HTTP_CACHE_DIR, exist_ok=True)
+        partial_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(partial_path, "wb") as f:
+            f.write(data)
+        os.replace(partial_path, path)  # Readers never see half a file
+        with http_cache_lock:
+            if http_cache_bytes is not None:
+                http_cache_bytes += len(data)
+        evict_http_cache()
+    except OSError as e:
+        if config.DEBUG:
+            print(f"Could not cache {url}: {e}")
+
+def evict_http_cache(budget=None):
+    """Delete the least recently used stored pages until the HTTP cache fits in its byte budget"""
+    global http_cache_bytes
+    with http_cache_lock:
+        http_cache_bytes = evict_lru(config.HTTP_CACHE_DIR, config.HTTP_CACHE_BYTES if budget is None else budget, http_cache_bytes)
+
+def conditional_headers(headers, entry):
+    """Add a stored copy's validators, so an unchanged page comes back as an empty 304"""
+    if entry is None:
+        return headers
+    headers = dict(headers)
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+def stored_response(url, entry, not_modified):
+    """A 200 response carrying the stored body, of the same kind (requests or httpx) as the 304 it answers"""
+    if httpx is not None and isinstance(not_modified, httpx.Response):
+        response = httpx.Response(200, content=entry["body"], request=not_modified.request)
+    else:
+        response = requests.Response()
+        response.status_code, response.url, response._content = 200, url, entry["body"]
+    response.encoding = entry["encoding"]
+    return response
+
+def revalidated(url, response, entry, host):
+    """Answer a 304 from the stored copy, and store a 200 with validators for next time"""
+    if response.status_code == 304 and entry is not None:
+        metrics.count("cache_hits_total", cache="http")
+        metrics.count("http_bytes_saved_total", len(entry["body"]), host=host, reason="not_modified")
+        with contextlib.suppress(OSError):
+            os.utime(http_cache_path(url))  # mtime doubles as the LRU timestamp
+        return stored_response(url, entry, response)
+    metrics.count("cache_misses_total", cache="http")
+    if response.status_code == 200:
+        save_http_entry(url, response)
+    return response
+
+def backoff_delay(attempt):
+    return min(config.BACKOFF_MAX, config.BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+def http_get(url, session=None, headers=None, retries=None, cache=False):
+    """
+    GET a URL through its host's limiter. Throttled, 5xx and timed out requests, and ones whose
+    connection failed or broke off, are retried with exponential backoff (or after the server's
+    Retry-After); any other response, including a 404, is returned. Raises FetchError once the
+    retries are used up, or straight away for errors retrying can't fix, such as a malformed URL.
+    With cache, a page stored by an earlier fetch is revalidated rather than downloaded again:
+    a 304 comes back as a 200 carrying the stored body (see revalidated).
+    """
+    sess = session or requests.Session()
+    limiter = host_limiter(url)
+    cache = cache and config.HTTP_CACHE and config.PERSIST_CACHE
+    entry = load_http_entry(url) if cache else None
+    headers = config.HEADERS if headers is None else headers
+    headers = conditional_headers({**(headers or {}), "Accept-Encoding": accept_encoding()}, entry)
+    retries = config.MAX_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        spend_request()
+        limiter.acquire()
+        metrics.gauge("http_in_flight", 1, host=limiter.host)
+        start = time.monotonic()
+        try:
+            response = sess.get(url, headers=headers, timeout=config.REQUEST_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            record_request(limiter.host, start)
+            limiter.record(None)
+            problem, delay = str(e), backoff_delay(attempt)
+        except requests.RequestException as e:
+            # A malformed URL, a redirect loop and the like fail the same way every time
+            record_request(limiter.host, start)
+            raise FetchError(f"Could not load {url}: {e}") from e
+        else:
+            record_request(limiter.host, start, response)
+            if response.status_code not in config.RETRY_STATUSES:
+                limiter.record(time.monotonic() - start)
+                return revalidated(url, response, entry, limiter.host) if cache else response
+            retry_after = retry_after_seconds(response)
+            limiter.record(None, throttled=response.status_code == 429 or retry_after is not None, retry_after=retry_after)
+            problem = f"HTTP {response.status_code}"
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+        finally:
+            limiter.release()
+            metrics.gauge("http_in_flight", -1, host=limiter.host)
+        
+        if config.DEBUG:
+            print(f"{problem} from {url} (attempt {attempt + 1} of {retries + 1})")
+        if attempt < retries:
+            metrics.count("http_retries_total", host=limiter.host)
+            time.sleep(delay)
+    raise FetchError(f"Could not load {url}: {problem}")
+
+async def http_get_async(client, url, retries=None, cache=False):
+    """
+    http_get for an httpx.AsyncClient; concurrency is left to the caller's semaphore.
+    httpx already asks for every content coding it can decode.
+    """
+    limiter = host_limiter(url)
+    retries = config.MAX_RETRIES if retries is None else retries
+    cache = cache and config.HTTP_CACHE and config.PERSIST_CACHE
+    entry = load_http_entry(url) if cache else None
+    headers = conditional_headers(config.HEADERS, entry)
+    for attempt in range(retries + 1):
+        spend_request()
+        await asyncio.sleep(limiter.reserve())
+        metrics.gauge("http_in_flight", 1, host=limiter.host)
+        start = time.monotonic()
+        try:
+            response = await client.get(url, headers=headers)
+        except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError) as e:
+            record_request(limiter.host, start)
+            limiter.record(None)
+            problem, delay = str(e) or type(e).__name__, backoff_delay(attempt)
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            record_request(limiter.host, start)
+            raise FetchError(f"Could not load {url}: {str(e) or type(e).__name__}") from e
+        else:
+            record_request(limiter.host, start, response)
+            if response.status_code not in config.RETRY_STATUSES:
+                limiter.record(time.monotonic() - start)
+                return revalidated(url, response, entry, limiter.host) if cache else response
+            retry_after = retry_after_seconds(response)
+            limiter.record(None, throttled=response.status_code == 429 or retry_after is not None, retry_after=retry_after)
+            problem = f"HTTP {response.status_code}"
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+        finally:
+            metrics.gauge("http_in_flight", -1, host=limiter.host)
+        
+        if config.DEBUG:
+            print(f"{problem} from {url} (attempt {attempt + 1} of {retries + 1})")
+        if attempt < retries:
+            metrics.count("http_retries_total", host=limiter.host)
+            await asyncio.sleep(delay)
+    raise FetchError(f"Could not load {url}: {problem}")
+
+@timed("fetch_page")
+def fetch_page_movies(username, page, session):
+    """
+    Fetch and parse movies from a single page. A page that doesn't exist has no movies;
+    raises FetchError if the page exists but couldn't be loaded.
+    """
+    resolved_url = config.WATCHLIST_URL.format(username, page)
+    if config.DEBUG:
+        print(f"Fetching page {page}: {resolved_url}")
+    
+    response = http_get(resolved_url, session, cache=True)
+    if response.status_code == 404:
+        return []
+    if response.status_code != 200:
+        raise FetchError(f"Page {page} of {username}'s watchlist returned {response.status_code}")
+    
+    page_movies, _ = parse_response(parse_watchlist_response, response, page)
+    return page_movies
+
+@timed("probe_watchlist")
+def probe_watchlist(username, session=None):
+    """Fetch only the first page, returning (total entries, first page movies)"""
+    first_page_url = config.WATCHLIST_URL.format(username, 1)
+    response = http_get(first_page_url, session, cache=True)
+    
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch first page: {response.status_code}")
+    
+    page_movies, total_entries = parse_response(parse_watchlist_response, response, 1)
+    if total_entries is None:
+        raise Exception("Could not find data-num-entries attribute")
+    
+    return total_entries, page_movies
+
+def init_parse_worker(film_url, parser_backend, debug):
+    """Give a parse worker the parent's settings, which a spawned process doesn't inherit"""
+    config.FILM_URL, config.PARSER_BACKEND, config.DEBUG = film_url, parser_backend, debug
+
+def get_parse_pool():
+    """The parse worker processes, created on first use, or None when parsing stays on the calling thread"""
+    global parse_pool
+    if config.PARSE_PROCESSES == 0:
+        return None
+    with parse_pool_lock:
+        if parse_pool is None:
+            # Spawned rather than forked: forking copies whatever locks the fetch threads hold
+            parse_pool = ProcessPoolExecutor(max_workers=config.PARSE_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=init_parse_worker, initargs=(config.FILM_URL, config.PARSER_BACKEND, config.DEBUG))
+        return parse_pool
+
+def parse_watchlist_response(content, encoding, page=1):
+    """Decode and parse a watchlist page's raw bytes; (movie records, total entries)"""
+    return parse_watchlist_page(content.decode(encoding, errors="replace"), page)
+
+def parse_film_response(content, encoding):
+    """Decode and parse a film page's raw bytes into its slim metadata"""
+    return slim_metadata(parse_film_metadata(content.decode(encoding, errors="replace")))
+
+def parse_response(parser, response, *args):
+    """
+    Run parse_watchlist_response or parse_film_response on a response. With PARSE_PROCESSES
+    set, the raw bytes go to a parse worker and only the parsed records come back, so many
+    fetch threads can parse at once instead of taking turns on the GIL.
+    """
+    pool = get_parse_pool()
+    encoding = response.encoding or "utf-8"
+    if pool is None:
+        return parser(response.content, encoding, *args)
+    with metrics.stage("parse_pool"):
+        return pool.submit(parser, response.content, encoding, *args).result()
+
+def get_fetch_pool():
+    """The process-wide pool every watchlist page is fetched on, created on first use"""
+    global fetch_pool
+    with fetch_pool_lock:
+        if fetch_pool is None:
+            fetch_pool = ThreadPoolExecutor(max_workers=config.FETCH_WORKERS, thread_name_prefix="fetch")
+        return fetch_pool
+
+def fetch_session():
+    """A session per fetch thread, so each keeps its connections alive from page to page"""
+    if not hasattr(fetch_sessions, "session"):
+        fetch_sessions.session = requests.Session()
+    return fetch_sessions.session
+
+def fetch_page(username, page):
+    return fetch_page_movies(username, page, fetch_session())
+
+class WatchlistDownload:
+    """
+    One user's watchlist pages on the fetch pool: the page 1 probe, then pages 2 onwards.
+    Everyone who needs the user's pages while they are coming in joins the same download and
+    reads the same futures, so each page is requested once however many groups (or single
+    fetches) want it. Queued pages are only dropped once the last reader has left.
+    """
+
+    def __init__(self, username, probe):
+        self.username = username
+        self.probe = probe  # Future of (total entries, page 1 movies)
+        self.pages = None   # [(page, future), ...] for pages 2 onwards, once queued
+        self.readers = 0
+
+def join_downloads(usernames, probes=None):
+    """
+    Join each user's download already in flight, or start one by probing page 1 (all users at
+    once); probes can hold page 1 results already at hand. Returns {username: WatchlistDownload}.
+    Every download joined has to be left again with leave_downloads.
+    """
+    probes = probes or {}
+    pool = get_fetch_pool()
+    downloads = {}
+    with watchlist_downloads_lock:
+        for user in dict.fromkeys(usernames):
+            download = watchlist_downloads.get(user)
+            if download is not None:
+                metrics.count("coalesced_total", kind="watchlist_pages")
+            else:
+                if user in probes:
+                    probe = Future()
+                    probe.set_result(probes[user])
+                else:
+                    probe = pool.submit(lambda user: probe_watchlist(user, fetch_session()), user)
+                download = watchlist_downloads[user] = WatchlistDownload(user, probe)
+            download.readers += 1
+            downloads[user] = download
+    return downloads
+
+def leave_downloads(downloads, usernames=None):
+    """
+    Stop reading some joined downloads (all of them by default), taking them out of `downloads`.
+    Once nobody reads a download any more, its queued pages are dropped.
+    """
+    with watchlist_downloads_lock:
+        for user in list(downloads if usernames is None else usernames):
+            download = downloads.pop(user, None)
+            if download is None:
+                continue
+            download.readers -= 1
+            if download.readers == 0:
+                if watchlist_downloads.get(user) is download:
+                    del watchlist_downloads[user]
+                download.probe.cancel()
+                for _, future in download.pages or []:
+                    future.cancel()
+
+def probe_watchlists(downloads):
+    """Wait for the downloads' page 1 probes: {username: (total entries, movies), or None if it failed}"""
+    probes = {}
+    for user, download in downloads.items():
+        try:
+            probes[user] = download.probe.result()
+        except Exception as e:
+            if config.DEBUG:
+                print(f"Could not probe watchlist for {user}: {e}")
+            probes[user] = None
+    return probes
+
+def submit_pages(downloads, probes):
+    """
+    Queue pages 2 onwards of the probed downloads on the fetch pool, interleaved so all users
+    progress together; a download whose pages another reader has queued already keeps those.
+    Returns {username: [(page, future), ...]}.
+    """
+    pool = get_fetch_pool()
+    with watchlist_downloads_lock:
+        total_pages = {user: math.ceil(total_entries / len(first_page)) for user, (total_entries, first_page) in probes.items()
+                       if downloads[user].pages is None}
+        for user in total_pages:
+            downloads[user].pages = []
+        for page in range(2, max(total_pages.values(), default=1) + 1):
+            for user, last_page in total_pages.items():
+                if page <= last_page:
+                    downloads[user].pages.append((page, pool.submit(fetch_page, user, page)))
+    return {user: downloads[user].pages for user in probes}
+
+def collect_watchlist(username, probe, pages, progress=None):
+    """Assemble a watchlist from its probed page 1 and submitted pages, returning (DataFrame, total entries)"""
+    total_entries, first_page = probe
+    total_pages = len(pages) + 1
+    all_movies = list(first_page)
+    missing_pages = []
+    if progress:
+        progress(username, 1, total_pages)
+    for done, (page, future) in enumerate(pages, 2):
+        try:
+            all_movies.extend(future.result())
+        except Exception as e:
+            if config.DEBUG:
+                print(f"Error fetching page {page}: {e}")
+            missing_pages.append(page)
+        if progress:
+            progress(username, done, total_pages)
+    
+    df = mark_partial(watchlist_frame(all_movies), username, missing_pages)
+    if config.DEBUG:
+        print(f"Successfully fetched {len(all_movies)} movies from {total_pages} pages (expected {total_entries})")
+    return df, total_entries
+
+@timed("scrape_watchlists")
+def scrape_watchlists(usernames, progress=None, probes=None):
+    """
+    Download every page of several watchlists, returning {username: (DataFrame, total entries)}.
+    All page 1 probes go out at once (unless given), then every remaining page of every user
+    shares the one bounded fetch pool, so a group takes about as long as its pages in total
+    rather than one user after another. A user whose pages are already being downloaded joins
+    that download instead of starting another. progress(username, pages_done, total_pages) is
+    called as pages arrive; if it raises, pages nobody else wants are dropped and it propagates.
+    """
+    downloads = join_downloads(usernames, probes)
+    results = {}
+    try:
+        probes = probe_watchlists(downloads)
+        # Without a count and a first page there is nothing to size the fetch by
+        pages = submit_pages(downloads, {user: probe for user, probe in probes.items() if probe and probe[1]})
+        for user in usernames:
+            if user in pages:
+                results[user] = collect_watchlist(user, probes[user], pages[user], progress)
+            else:
+                if config.DEBUG:
+                    print("Falling back to sequential fetching...")
+                results[user] = fetch_watchlist_sequential(user), None
+    finally:
+        leave_downloads(downloads)
+    return results
+
+def scrape_watchlist(username, progress=None, probe=None):
+    """Download every page of one watchlist, returning (DataFrame, total entries); see scrape_watchlists"""
+    return scrape_watchlists([username], progress, {username: probe} if probe else None)[username]
+
+def mark_partial(df, username, missing_pages):
+    """Flag a watchlist that is missing pages, so it is never mistaken for the whole list"""
+    df.attrs["partial"] = bool(missing_pages)
+    if missing_pages:
+        df.attrs["missing_pages"] = list(missing_pages)
+        print(f"Warning: {len(missing_pages)} page(s) of {username}'s watchlist could not be loaded, so it is incomplete")
+    return df
+
+async def fetch_page_async(client, semaphore, url):
+    """Fetch a page through the shared client, returning the response, or None if it failed"""
+    async with semaphore:
+        try:
+            response = await http_get_async(client, url, cache=True)
+        except FetchError as e:
+            if config.DEBUG:
+                print(f"Error fetching {url}: {e}")
+            return None
+    return response if response.status_code == 200 else None
+
+async def parse_response_async(parser, response, *args):
+    """parse_response for the event loop, which keeps serving responses while a parse worker is busy"""
+    pool = get_parse_pool()
+    if pool is None:
+        return parser(response.content, response.encoding or "utf-8", *args)
+    return await asyncio.wrap_future(pool.submit(parser, response.content, response.encoding or "utf-8", *args))
+
+async def scrape_watchlist_async(client, semaphore, username):
+    """Async counterpart of scrape_watchlist, reusing the already parsed page 1"""
+    first_response = await fetch_page_async(client, semaphore, config.WATCHLIST_URL.format(username, 1))
+    first_page, total_entries = await parse_response_async(parse_watchlist_response, first_response, 1) if first_response else ([], None)
+    if total_entries is None or not first_page:
+        if config.DEBUG:
+            print("Falling back to sequential fetching...")
+        return await asyncio.to_thread(fetch_watchlist_sequential, username), None
+    
+    total_pages = math.ceil(total_entries / len(first_page))
+    pages = {1: first_page}
+    
+    async def fetch_page(page):
+        response = await fetch_page_async(client, semaphore, config.WATCHLIST_URL.format(username, page))
+        if response is None:
+            return page, None
+        return page, (await parse_response_async(parse_watchlist_response, response, page))[0]
+    
+    # Parse each page as soon as its response arrives
+    missing_pages = []
+    for next_page in asyncio.as_completed([fetch_page(page) for page in range(2, total_pages + 1)]):
+        page, movies = await next_page
+        pages[page] = movies or []
+        if movies is None:
+            missing_pages.append(page)
+    
+    all_movies = [movie for page in sorted(pages) for movie in pages[page]]
+    df = mark_partial(watchlist_frame(all_movies), username, sorted(missing_pages))
+    if config.DEBUG:
+        print(f"Successfully fetched {len(all_movies)} movies from {total_pages} pages (expected {total_entries})")
+    return df, total_entries
+
+async def scrape_watchlists_async(usernames, max_connections=None):
+    """Scrape several watchlists in one event loop over one pooled HTTP/2-capable client"""
+    if httpx is None:
+        raise Exception("The async fetch engine needs httpx (pip install httpx[http2])")
+    max_connections = max_connections or config.ASYNC_MAX_CONNECTIONS
+    
+    try:
+        import h2  # noqa: F401 -- httpx only negotiates HTTP/2 when h2 is installed
+        http2 = True
+    except ImportError:
+        http2 = False
+    
+    semaphore = asyncio.Semaphore(max_connections)
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    timeout = httpx.Timeout(config.REQUEST_TIMEOUT[1], connect=config.REQUEST_TIMEOUT[0])
+    async with httpx.AsyncClient(http2=http2, limits=limits, follow_redirects=True, timeout=timeout) as client:
+        results = await asyncio.gather(*[scrape_watchlist_async(client, semaphore, user) for user in usernames])
+    return dict(zip(usernames, results))
+
+def store_watchlist(username, df, total_entries, export_csv=False):
+    """Put a freshly scraped watchlist into the memory and disk caches"""
+    df.attrs["num_entries"] = total_entries
+    with watchlists_lock:
+        watchlists[username] = df
+        invalidate_intersections(username)
+    revalidated_users.add(username)
+    # An incomplete list stays in memory for this pick but is never stored as the user's watchlist
+    if config.PERSIST_CACHE and not df.empty and not df.attrs.get("partial"):
+        save_cached_watchlist(username, df, total_entries)
+    
+    if export_csv and not df.empty:
+        os.makedirs("watchlists", exist_ok=True)
+        df.to_csv(f"watchlists/{username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_watchlist.csv", index=False)
+
+def fetch_cached_only(username):
+    """Load a watchlist from the disk cache into memory without scraping; returns whether it was found"""
+    # Serve the on-disk copy straight away and check it against Letterboxd in the background
+    df = load_cached_watchlist(username)
+    metrics.count("cache_misses_total" if df is None else "cache_hits_total", cache="watchlist_disk")
+    if df is None:
+        return False
+    if config.DEBUG:
+        print("Loading watchlist from disk cache...")
+    watchlists[username] = df
+    start_watchlist_revalidation(username)
+    return True
+
+def load_watchlist(username, export_csv=False, engine=None, progress=None):
+    """Bring a watchlist into memory from the disk cache or Letterboxd; one call per user at a time"""
+    with watchlists_lock:
+        df = watchlists.get(username)
+        if df is not None and df.attrs.get("partial"):
+            watchlists.pop(username)  # Try the pages that failed last time again
+            df = None
+    if df is None and config.PERSIST_CACHE and fetch_cached_only(username):
+        df = watchlists[username]
+    if df is None:
+        if (engine or config.FETCH_ENGINE) == "async":
+            df, total_entries = asyncio.run(scrape_watchlists_async([username]))[username]
+        else:
+            df, total_entries = scrape_watchlist(username, progress=progress)
+        store_watchlist(username, df, total_entries, export_csv)
+    return df
+
+@timed("fetch_watchlist")
+def fetch_watchlist(username, export_csv=False, engine=None, progress=None):
+    df = watchlists.get(username)
+    cached = df is not None and not df.attrs.get("partial")
+    metrics.count("cache_hits_total" if cached else "cache_misses_total", cache="watchlist")
+    if cached:
+        if config.DEBUG:
+            print("Loading watchlist from cache...")
+    else:
+        # Concurrent callers for the same user share one download
+        df = watchlist_flights.do(username, load_watchlist, username, export_csv, engine, progress)
+    
+    if df.empty and df.attrs.get("partial"):
+        raise Exception(f"Could not load {username}'s watchlist. Please try again later.")
+    if df.empty:
+        raise Exception("Watchlist is empty.")
+
+    return df
+
+@timed("fetch_watchlist_sequential")
+def fetch_watchlist_sequential(username, export_csv=False):
+    """Fallback sequential method"""
+    session = requests.Session()
+    all_movies = []
+    missing_pages = []
+    
+    for page in range(1, 100):
+        try:
+            page_movies = fetch_page_movies(username, page, session)
+        except Exception as e:
+            if config.DEBUG:
+                print(f"Error fetching page {page}: {e}")
+            missing_pages.append(page)  # Without a page count, nothing after this can be trusted
+            break
+        if not page_movies:
+            break
+        all_movies.extend(page_movies)
+    
+    df = mark_partial(watchlist_frame(all_movies), username, missing_pages)
+    if export_csv and not df.empty:
+        os.makedirs("watchlists", exist_ok=True)
+        df.to_csv(f"watchlists/{username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_watchlist.csv", index=False)
+    
+    return df
+
+def cache_connection():
+    """Open the persistent cache database, creating the tables on first use"""
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(config.CACHE_DB, timeout=30)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS watchlist_info (
+            username TEXT PRIMARY KEY,
+            fetched_at REAL NOT NULL,
+            num_entries INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS watchlist_movies (
+            username TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT, year TEXT, slug TEXT, film_id TEXT, lid TEXT, uri TEXT,
+            PRIMARY KEY (username, position)
+        );
+        CREATE TABLE IF NOT EXISTS film_metadata (
+            film_key TEXT PRIMARY KEY,
+            fetched_at REAL NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS intersection_members (
+            users TEXT NOT NULL,
+            username TEXT NOT NULL,
+            PRIMARY KEY (users, username)
+        );
+        CREATE INDEX IF NOT EXISTS intersection_members_username ON intersection_members (username);
+        CREATE TABLE IF NOT EXISTS intersection_movies (
+            users TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT, year TEXT, slug TEXT, film_id TEXT, lid TEXT, uri TEXT,
+            PRIMARY KEY (users, position)
+        );
+    """)
+    return conn
+
+@timed("save_cached_watchlist")
+def save_cached_watchlist(username, df, num_entries, fetched_at=None):
+    """Replace the stored copy of a user's watchlist"""
+    rows = [(username, position, *values) for position, values in enumerate(df[WATCHLIST_COLUMNS].itertuples(index=False))]
+    try:
+        conn = cache_connection()
+        with conn:
+            conn.execute("DELETE FROM watchlist_movies WHERE username = ?", (username,))
+            conn.executemany("INSERT INTO watchlist_movies VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            delete_cached_intersections(conn, username)
+            conn.execute("INSERT OR REPLACE INTO watchlist_info VALUES (?, ?, ?)",
+                         (username, time.time() if fetched_at is None else fetched_at, num_entries))
+        conn.close()
+    except sqlite3.Error as e:
+        if config.DEBUG:
+            print(f"Could not save watchlist for {username}: {e}")
+
+@timed("load_cached_watchlist")
+def load_cached_watchlist(username):
+    """Load a user's watchlist from disk, or None if it has never been stored"""
+    try:
+        conn = cache_connection()
+        info = conn.execute("SELECT fetched_at, num_entries FROM watchlist_info WHERE username = ?", (username,)).fetchone()
+        rows = conn.execute(
+            "SELECT name, year, slug, film_id, lid, uri FROM watchlist_movies WHERE username = ? ORDER BY position",
+            (username,)).fetchall()
+        conn.close()
+    except sqlite3.Error as e:
+        if config.DEBUG:
+            print(f"Could not read cached watchlist for {username}: {e}")
+        return None
+    
+    if info is None:
+        return None
+    
+    df = watchlist_frame(rows)
+    df.attrs["fetched_at"], df.attrs["num_entries"] = info
+    return df
+
+def save_cached_intersection(key, df):
+    """Replace the stored intersection of a group (key is its sorted usernames)"""
+    users = ",".join(key)
+    rows = [(users, position, *values) for position, values in enumerate(df[WATCHLIST_COLUMNS].itertuples(index=False))]
+    try:
+        conn = cache_connection()
+        with conn:
+            conn.execute("DELETE FROM intersection_movies WHERE users = ?", (users,))
+            conn.executemany("INSERT OR REPLACE INTO intersection_members VALUES (?, ?)", [(users, username) for username in key])
+            conn.executemany("INSERT INTO intersection_movies VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.close()
+    except sqlite3.Error as e:
+        if config.DEBUG:
+            print(f"Could not save intersection for {users}: {e}")
+
+def load_cached_intersection(key):
+    """Load a group's stored intersection, or None if it isn't stored or a member's watchlist no longer is"""
+    users = ",".join(key)
+    try:
+        conn = cache_connection()
+        members = conn.execute("SELECT COUNT(*) FROM intersection_members JOIN watchlist_info USING (username) WHERE users = ?",
+                               (users,)).fetchone()[0]
+        rows = conn.execute(
+            "SELECT name, year, slug, film_id, lid, uri FROM intersection_movies WHERE users = ? ORDER BY position",
+            (users,)).fetchall()
+        conn.close()
+    except sqlite3.Error as e:
+        if config.DEBUG:
+            print(f"Could not read cached intersection for {users}: {e}")
+        return None
+    
+    if members != len(key):
+        return None
+    return watchlist_frame(rows)
+
+def delete_cached_intersections(conn, username):
+    """Drop the stored intersections of every group the user belongs to (inside the caller's transaction)"""
+    groups = [users for (users,) in conn.execute("SELECT users FROM intersection_members WHERE username = ?", (username,))]
+    for users in groups:
+        conn.execute("DELETE FROM intersection_movies WHERE users = ?", (users,))
+        conn.execute("DELETE FROM intersection_members WHERE users = ?", (users,))
+
+def cached_intersection_keys():
+    """Sorted username tuples of the groups with a stored intersection"""
+    try:
+        conn = cache_connection()
+        keys = [tuple(users.split(",")) for (users,) in conn.execute("SELECT DISTINCT users FROM intersection_members ORDER BY users")]
+        conn.close()
+    except sqlite3.Error as e:
+        if config.DEBUG:
+            print(f"Could not list cached intersections: {e}")
+        return []
+    return keys
+
+def touch_cached_watchlist(username):
+    """Mark a stored watchlist as confirmed up to date"""
+    try:
+        conn = cache_connection()
+        with conn:
+            conn.execute("UPDATE watchlist_info SET fetched_at = ? WHERE username = ?", (time.time(), username))
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+def invalidate_intersections(username):
+    """Drop cached multi-user intersections that include the given user"""
+    with watchlists_lock:
+        for key in [k for k in watchlists if isinstance(k, tuple) and username in k]:
+            watchlists.pop(key)
+
+def sync_watchlist(username, probe=None, session=None):
+    """
+    Incrementally bring the cached watchlist up to date.
+    New films are only ever added at the front, so pages are walked from 1 until one
+    contains an already cached slug and the new films are merged in front of the cache.
+    Falls back to a full scrape when there is no cache or the entry count shows removals.
+    """
+    sess = session or requests.Session()
+    cached = watchlists.get(username)
+    if cached is None and config.PERSIST_CACHE:
+        cached = load_cached_watchlist(username)
+    
+    total_entries, movies = probe or probe_watchlist(username, sess)
+    if cached is None or cached.empty:
+        df, total_entries = scrape_watchlist(username, probe=(total_entries, movies))
+        df.attrs["num_entries"] = total_entries
+        return df
+    
+    known_slugs = set(cached["Slug"])
+    new_movies = []
+    page = 1
+    while movies:
+        fresh = [movie for movie in movies if movie["Slug"] not in known_slugs]
+        new_movies.extend(fresh)
+        if len(fresh) < len(movies):
+            break  # Reached films we already have
+        page += 1
+        movies = fetch_page_movies(username, page, sess)
+    
+    df = compact_watchlist(pd.concat([watchlist_frame(new_movies), cached[WATCHLIST_COLUMNS]], ignore_index=True))
+    if len(df) != total_entries:
+        # Films were removed (or the list was reordered), so the delta can't be trusted
+        if config.DEBUG:
+            print(f"Entry count mismatch for {username} ({len(df)} vs {total_entries}), re-scraping...")
+        df, total_entries = scrape_watchlist(username, probe=probe)
+    elif config.DEBUG:
+        print(f"Synced {len(new_movies)} new movies for {username} from {page} page(s)")
+    
+    df.attrs["num_entries"] = total_entries
+    return df
+
+def revalidate_watchlist(username):
+    """
+    Compare the cached watchlist against page 1 and refresh it only if it has changed.
+    Returns True if it was refreshed, False if it was up to date, None if it couldn't be checked.
+    """
+    cached = watchlists.get(username)
+    if cached is None:
+        return None
+    
+    session = requests.Session()
+    try:
+        total_entries, first_page = probe_watchlist(username, session)
+    except Exception as e:
+        if config.DEBUG:
+            print(f"Could not revalidate watchlist for {username}: {e}")
+        return None
+    
+    first_slugs = [movie["Slug"] for movie in first_page]
+    cached_slugs = list(cached["Slug"].head(len(first_slugs)))
+    if total_entries == cached.attrs.get("num_entries") and first_slugs == cached_slugs:
+        if config.DEBUG:
+            print(f"Cached watchlist for {username} is up to date")
+        touch_cached_watchlist(username)
+        return False
+    
+    if config.DEBUG:
+        print(f"Watchlist for {username} has changed, refreshing...")
+    try:
+        if config.INCREMENTAL_SYNC:
+            df = sync_watchlist(username, probe=(total_entries, first_page), session=session)
+        else:
+            df, total_entries = scrape_watchlist(username, probe=(total_entries, first_page))
+            df.attrs["num_entries"] = total_entries
+    except Exception as e:
+        if config.DEBUG:
+            print(f"Could not refresh watchlist for {username}: {e}")
+        return None
+    if df.empty or df.attrs.get("partial"):
+        return None  # Keep the complete cached copy rather than an incomplete refresh
+    save_cached_watchlist(username, df, df.attrs.get("num_entries"))
+    with watchlists_lock:
+        watchlists[username] = df
+        invalidate_intersections(username)
+    return True
+
+def start_watchlist_revalidation(username):
+    """Revalidate a disk-cached watchlist in a daemon thread, once per session"""
+    with revalidation_lock:
+        if username in revalidated_users:
+            return
+        revalidated_users.add(username)
+    cached = watchlists.get(username)
+    if cached is not None and time.time() - cached.attrs.get("fetched_at", 0) < config.WATCHLIST_FRESH_FOR:
+        return  # Checked recently enough, e.g. by `random_movie warm`
+    
+    threading.Thread(target=revalidate_watchlist, args=(username,), daemon=True).start()
+
+def poster_cache_path(key):
+    return os.path.join(config.POSTER_DIR, f"{key}.jpg")
+
+def load_cached_poster(key):
+    """Open a cached poster and mark it as recently used, or return None"""
+    from PIL import Image
+    path = poster_cache_path(key)
+    try:
+        img = Image.open(path)
+        img.load()
+        os.utime(path)  # mtime doubles as the LRU timestamp
+        return img
+    except (OSError, ValueError):
+        return None
+
+def evict_lru(directory, budget, cached_bytes):
+    """
+    Delete a cache directory's least recently used files (oldest mtime first) until it fits in
+    the budget. cached_bytes is the running total, or None if it hasn't been counted yet;
+    returns the new total.
+    """
+    if cached_bytes is not None and cached_bytes <= budget:
+        return cached_bytes
+    entries = []
+    for entry in os.scandir(directory):
+        stat = entry.stat()
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    cached_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if cached_bytes <= budget:
+            break
+        try:
+            os.remove(path)
+            cached_bytes -= size
+        except OSError:
+            pass
+    return cached_bytes
+
+def evict_posters(budget=None):
+    """Delete the least recently used posters until the cache fits in its byte budget"""
+    global poster_cache_bytes
+    with poster_cache_lock:
+        poster_cache_bytes = evict_lru(config.POSTER_DIR, config.POSTER_CACHE_BYTES if budget is None else budget, poster_cache_bytes)
+
+def save_cached_poster(key, img):
+    """Resize a poster to the display size and store it, returning the resized image"""
+    global poster_cache_bytes
+    img = img.convert("RGB")
+    img.thumbnail(config.POSTER_SIZE)
+    if not config.PERSIST_CACHE:
+        return img
+    try:
+        os.makedirs(config.POSTER_DIR, exist_ok=True)
+        path = poster_cache_path(key)
+        img.save(path, "JPEG", quality=90)
+        with poster_cache_lock:
+            if poster_cache_bytes is not None:
+                poster_cache_bytes += os.path.getsize(path)
+        evict_posters()
+    except OSError as e:
+        if config.DEBUG:
+            print(f"Could not cache poster {key}: {e}")
+    return img
+
+def poster_key(metadata, key=None):
+    """The poster cache key for a film: its Film ID when known, else a hash of the poster URL"""
+    return key or hashlib.sha1(metadata["image"].encode()).hexdigest()
+
+def get_poster_image(metadata, session=None, key=None):
+    key = poster_key(metadata, key)
+    img = load_cached_poster(key) if config.PERSIST_CACHE else None
+    metrics.count("cache_misses_total" if img is None else "cache_hits_total", cache="poster")
+    if img is not None:
+        return img
+    # A poster wanted by the pick and the prefetcher at once is only downloaded once
+    return poster_flights.do(key, download_poster, metadata["image"], session, key)
+
+def download_poster(img_url, session, key):
+    """Download a poster into the cache, unless a call that just finished already stored it"""
+    img = load_cached_poster(key) if config.PERSIST_CACHE else None
+    if img is not None:
+        return img
+    with metrics.stage("poster_download"):
+        img_response = http_get(img_url, session, headers=config.POSTER_HEADERS)
+        if img_response.status_code != 200:
+            raise FetchError(f"Could not load poster: {img_response.status_code}")
+        from PIL import Image
+        img = Image.open(io.BytesIO(img_response.content))
+        return save_cached_poster(key, img)
+
+def prefetch_poster(metadata, session=None, key=None):
+    """Download a poster into the cache unless it is already there"""
+    key = poster_key(metadata, key)
+    if not os.path.exists(poster_cache_path(key)):
+        get_poster_image(metadata, session, key)
+
+def film_keys(df):
+    """Per-row intersection keys: the integer film ID, or the slug for rows without one"""
+    film_ids = pd.to_numeric(df["Film ID"], errors="coerce")
+    return film_ids.astype("Int64").astype(object).where(film_ids > 0, df["Slug"])
+
+def page_film_keys(page_movies):
+    """Intersection keys for a list of parsed movie dicts"""
+    return {int(movie["Film ID"]) if str(movie["Film ID"]).isdigit() else movie["Slug"] for movie in page_movies}
+
+def store_intersection(key, df, sources, save=True):
+    """
+    Cache an intersection, unless a watchlist (or cached intersection) it was worked out from
+    has been replaced or dropped since: sources maps those keys to the DataFrames used.
+    With PERSIST_CACHE it is also stored on disk, until a member's stored watchlist is replaced.
+    """
+    with watchlists_lock:
+        if all(watchlists.get(source) is used for source, used in sources.items()):
+            watchlists[key] = df
+            # Saved under the lock, so a member replaced after this check deletes it again when stored
+            if save and config.PERSIST_CACHE:
+                save_cached_intersection(key, df)
+            return True
+    if config.DEBUG:
+        print(f"Not caching the intersection of {', '.join(key)}: a watchlist changed while it was worked out")
+    return False
+
+def fetch_cached_intersection(key):
+    """Load a group's intersection from the disk cache into memory without scraping; returns it or None"""
+    # Members come from memory or disk first, so they are revalidated like any disk-cached watchlist
+    # and the intersection is only kept if none of them is replaced while it loads
+    sources = {}
+    for username in key:
+        if watchlists.get(username) is None and not fetch_cached_only(username):
+            return None
+        sources[username] = watchlists.get(username)
+    df = load_cached_intersection(key)
+    metrics.count("cache_misses_total" if df is None else "cache_hits_total", cache="intersection_disk")
+    if df is None or not store_intersection(key, df, sources, save=False):
+        return None
+    if config.DEBUG:
+        print("Loading intersected watchlist from disk cache...")
+    return df
+
+def cached_subset(usernames):
+    """(key, DataFrame) of the largest cached multi-user intersection covering a subset of these users, or (None, None)"""
+    group = set(usernames)
+    best = None
+    with watchlists_lock:
+        for key in watchlists:
+            if isinstance(key, tuple) and set(key) <= group and (best is None or len(key) > len(best)):
+                best = key
+        return best, watchlists.get(best)
+
+@timed("intersection")
+def stream_intersection(usernames, export_csv=False, progress=None, start=None):
+    """
+    Intersect several watchlists starting from the smallest one.
+    Every user's page 1 is probed at once, then the smallest watchlist's pages and all the
+    other users' pages share the fetch pool. Only the smallest watchlist is kept in full; the
+    other users' pages just prune a set of integer film IDs. A user's remaining pages are
+    dropped once every film still in the running has been seen in their list, and everyone's
+    once nothing is left in common, unless another caller is still reading them: pages come
+    from each user's shared WatchlistDownload, so groups with a member in common fetch that
+    member's pages once.
+    If the intersection for a subset of the group is already cached it is used as the
+    starting point (start, from cached_subset unless given), so adding one user to a group
+    only costs that user's pages. The complete result, and each sub-group's, is cached with
+    store_intersection.
+    """
+    subset, subset_df = start or cached_subset(usernames)
+    remaining = [user for user in usernames if not subset or user not in subset]
+    
+    # Cached lists already know their size, everyone else gets a page 1 probe (all at once)
+    uncached = [user for user in remaining
+                if (user not in watchlists or watchlists[user].attrs.get("partial")) and not (config.PERSIST_CACHE and fetch_cached_only(user))]
+    downloads = join_downloads(uncached)
+    try:
+        probes = probe_watchlists(downloads)
+        streamed = {user: probe for user, probe in probes.items() if probe and probe[1]}
+        leave_downloads(downloads, [user for user in uncached if user not in streamed])  # Fetched in full below
+        
+        def size(user):
+            if user not in probes:
+                return len(watchlists[user])
+            return probes[user][0] if probes[user] else math.inf
+        order = sorted(remaining, key=size)
+        members = list(subset) if subset else [order.pop(0)]
+        
+        # The smallest list is downloaded in full, so its pages go to the front of the queue
+        pages = submit_pages(downloads, {user: probe for user, probe in streamed.items() if user == members[0] and not subset})
+        pages.update(submit_pages(downloads, {user: probe for user, probe in streamed.items() if user not in pages}))
+        if subset:
+            if config.DEBUG:
+                print(f"Starting from cached intersection of {', '.join(subset)}")
+            base = subset_df
+            sources = {subset: base}
+        else:
+            print(f"Fetching watchlist for user: {members[0]}")
+            streamed.pop(members[0], None)
+            # Joins the download above, so its pages are read rather than fetched again
+            base = fetch_watchlist(members[0], export_csv=export_csv, progress=progress)
+            sources = {members[0]: base}
+        base_keys = film_keys(base)
+        candidates = set(base_keys)
+        partial = bool(base.attrs.get("partial"))
+        
+        def finish(user):
+            print(f"Intersecting with user {len(members) + 1} watchlist...")
+            members.append(user)
+            leave_downloads(downloads, [user])
+            if len(members) < len(usernames) and not partial:
+                # Keep each sub-group's intersection so later group changes can start from it
+                store_intersection(tuple(sorted(members)), base[base_keys.isin(candidates)][WATCHLIST_COLUMNS].copy(), sources)
+        
+        # Users whose whole list is at hand, or whose probe failed and need a full fetch
+        for user in order:
+            if user not in streamed and candidates:
+                df = fetch_watchlist(user, export_csv=export_csv, progress=progress)
+                sources[user] = df
+                candidates &= set(film_keys(df))
+                partial = partial or bool(df.attrs.get("partial"))
+                finish(user)
+        
+        # Stream everyone else's pages as they arrive
+        seen = {user: candidates & page_film_keys(streamed[user][1]) for user in streamed}
+        failed = dict.fromkeys(streamed, 0)
+        done = dict.fromkeys(streamed, 1)
+        owners = {future: user for user in streamed for _, future in pages[user]}
+        
+        def stop_early():
+            for user in [user for user in streamed if user not in members and candidates <= seen[user]]:
+                if config.DEBUG:
+                    print(f"All candidates found for {user} after {done[user]} of {len(pages[user]) + 1} pages")
+                finish(user)
+        
+        # A list that fits on page 1 has been read in full already, so settle it before any page arrives
+        for user in streamed:
+            if not pages[user] and user not in members:
+                candidates &= seen[user]
+                finish(user)
+        stop_early()
+        # Pages someone else is still reading carry on after this group has settled their user
+        waiting = set(owners)
+        while waiting and candidates and not all(user in members for user in streamed):
+            arrived, waiting = wait(waiting, return_when=FIRST_COMPLETED)
+            for future in arrived:
+                user = owners[future]
+                if user in members or not candidates:
+                    continue  # Already settled, or nothing left in common
+                try:
+                    seen[user] |= candidates & page_film_keys(future.result())
+                except Exception as e:
+                    if config.DEBUG:
+                        print(f"Error fetching a page of {user}'s watchlist: {e}")
+                    failed[user] += 1
+                done[user] += 1
+                if progress:
+                    progress(user, done[user], len(pages[user]) + 1)
+                
+                if done[user] == len(pages[user]) + 1:
+                    # Read the whole list: anything it doesn't have is out
+                    if failed[user] and not candidates <= seen[user]:
+                        print(f"Warning: {failed[user]} page(s) of {user}'s watchlist could not be loaded, so the intersection is incomplete")
+                        partial = True
+                    candidates &= seen[user]
+                    finish(user)
+                if not candidates and config.DEBUG:
+                    print("No common movies left, skipping remaining users")
+                stop_early()
+    finally:
+        leave_downloads(downloads)
+    
+    result = base[base_keys.isin(candidates)][WATCHLIST_COLUMNS].copy()
+    result.attrs["partial"] = partial
+    if not partial:
+        store_intersection(tuple(sorted(usernames)), result, sources)
+    return result
+
+@timed("fetch_multiple_watchlists")
+def fetch_multiple_watchlists(usernames, export_csv=False, engine=None, progress=None):
+    """
+    Fetch and intersect watchlists for multiple usernames.
+    Returns a DataFrame with movies common to all users.
+    """
+    if not usernames:
+        return pd.DataFrame()
+    
+    if len(usernames) == 1:
+        return fetch_watchlist(usernames[0], export_csv=export_csv, engine=engine, progress=progress)
+    
+    multi_username_key = tuple(sorted(usernames))
+    result = watchlists.get(multi_username_key)
+    metrics.count("cache_misses_total" if result is None else "cache_hits_total", cache="intersection")
+    if result is not None:
+        if config.DEBUG:
+            print("Loading intersected watchlist from cache...")
+        return result
+    # The same group asked for twice at once (in any order) is only worked out once
+    return intersection_flights.do(multi_username_key, intersect_watchlists, usernames, export_csv, engine, progress)
+
+def intersect_watchlists(usernames, export_csv=False, engine=None, progress=None):
+    """Work out and cache the intersection of several users' watchlists"""
+    multi_username_key = tuple(sorted(usernames))
+    result = watchlists.get(multi_username_key)
+    if result is not None:
+        return result  # Stored by a call that finished just before this one started
+    if config.PERSIST_CACHE:
+        result = fetch_cached_intersection(multi_username_key)
+        if result is not None:
+            return result
+    
+    # Every engine starts from the cached intersection of as much of the group as possible
+    subset, base = cached_subset(usernames)
+    if config.STREAMING_INTERSECTION and (engine or config.FETCH_ENGINE) != "async":
+        result = stream_intersection(usernames, export_csv=export_csv, progress=progress, start=(subset, base))
+        print(f"Found {len(result)} common movies across all {len(usernames)} users")
+        return result
+    remaining = [user for user in usernames if not subset or user not in subset]
+    
+    def load_missing(users):
+        if (engine or config.FETCH_ENGINE) == "async":
+            scraped = asyncio.run(scrape_watchlists_async(users))
+        else:
+            scraped = scrape_watchlists(users, progress)
+        for user, (df, total_entries) in scraped.items():
+            store_watchlist(user, df, total_entries, export_csv)
+        return {user: df for user, (df, _) in scraped.items()}
+    
+    # Pull every uncached user's pages at once rather than one user after another, through the
+    # same per-user flights as fetch_watchlist, so users someone else is downloading are waited for
+    missing = [user for user in remaining if user not in watchlists and not (config.PERSIST_CACHE and fetch_cached_only(user))]
+    if missing:
+        watchlist_flights.do_many(missing, load_missing)
+    
+    dfs = []
+    sources = {}
+    if subset:
+        if config.DEBUG:
+            print(f"Starting from cached intersection of {', '.join(subset)}")
+        dfs.append(base)
+        sources[subset] = base
+    for user in remaining:
+        print(f"Fetching watchlist for user: {user}")
+        df = sources[user] = fetch_watchlist(user, export_csv=export_csv, engine=engine, progress=progress)
+        df_clean = df[WATCHLIST_COLUMNS].copy()
+        dfs.append(df_clean)
+    
+    if not dfs:
+        return pd.DataFrame()
+    
+    # Find intersection of all watchlists by Slug
+    common_slugs = set(dfs[0]['Slug'])
+    for i, df in enumerate(dfs[1:], 1):
+        print(f"Intersecting with user {i+1} watchlist...")
+        user_slugs = set(df['Slug'])
+        common_slugs = common_slugs.intersection(user_slugs)
+    
+    # Filter the first user's DataFrame to only include common movies
+    result = dfs[0][dfs[0]['Slug'].isin(common_slugs)].copy()
+    result.attrs["partial"] = any(df.attrs.get("partial") for df in dfs)
+
+    # Save to dict for caching (an incomplete intersection is worked out again next time)
+    if not result.attrs["partial"]:
+        store_intersection(multi_username_key, result, sources)
+    
+    print(f"Found {len(result)} common movies across all {len(usernames)} users")
+    return result
+
+def slim_metadata(meta):
+    """The fields the picker displays and filters on, pulled out of a JSON-LD record"""
+    if "directors" in meta and "genres" in meta:
+        # Already slim (stored, or parsed in a worker process); just share its strings
+        meta["directors"] = [shared_string(director) for director in meta["directors"]]
+        meta["genres"] = [shared_string(genre) for genre in meta["genres"]]
+        return meta
+    directors = meta.get("director") or []
+    if isinstance(directors, dict):
+        directors = [directors]
+    genres = meta.get("genre") or []
+    if isinstance(genres, str):
+        genres = [genres]
+    rating = (meta.get("aggregateRating") or {}).get("ratingValue")
+    runtime = meta.get("duration")
+    if isinstance(runtime, str):
+        match = re.fullmatch(r"PT(?:(\d+)H)?(?:(\d+)M)?", runtime)
+        runtime = int(match.group(1) or 0) * 60 + int(match.group(2) or 0) if match else None
+    return {
+        "directors": [shared_string(d.get("name")) for d in directors if isinstance(d, dict) and d.get("name")],
+        "genres": [shared_string(genre) for genre in genres],
+        "rating": float(rating) if rating is not None else None,
+        "runtime": runtime,
+        "image": meta.get("image"),
+    }
+
+def metadata_frame(records, index):
+    """Slim metadata records (None where missing) as METADATA_COLUMNS"""
+    records = [meta if isinstance(meta, dict) and meta else None for meta in records]
+    def joined(name):
+        return [shared_string("|".join(meta[name])) if meta else None for meta in records]
+    def field(name):
+        return [meta.get(name) if meta else None for meta in records]
+    values = {"Metadata": records, "Directors": joined("directors"), "Genres": joined("genres"),
+              "Rating": field("rating"), "Runtime": field("runtime")}
+    return pd.DataFrame({column: pd.Series(values[column], index=index, dtype=dtype)
+                         for column, dtype in METADATA_COLUMNS.items()}, index=index)
+
+@timed("metadata_write")
+def apply_metadata(df, labels, records):
+    """Write a batch of film details into a watchlist, typed columns included, in one locked step"""
+    frame = metadata_frame(records, pd.Index(labels))
+    positions = df.index.get_indexer(frame.index)
+    with metadata_lock:
+        for column, dtype in METADATA_COLUMNS.items():
+            if column not in df.columns:
+                df[column] = pd.Series(None, index=df.index, dtype=dtype)
+            df.iloc[positions, df.columns.get_loc(column)] = frame[column].array
+
+def metadata_snapshot(df):
+    """A watchlist's METADATA_COLUMNS as of the last whole batch written to it"""
+    with metadata_lock:
+        if "Metadata" in df.columns:
+            return df[list(METADATA_COLUMNS)].copy()
+    return metadata_frame([None] * len(df), df.index)
+
+def metadata_count(df):
+    """Films in a watchlist whose details have been written to it"""
+    with metadata_lock:
+        return int(df["Metadata"].notna().sum()) if "Metadata" in df.columns else 0
+
+def watchlist_row(df, label):
+    """One row of a watchlist, read between metadata batches"""
+    with metadata_lock:
+        return df.loc[label]
+
+class MetadataBatch:
+    """
+    Side buffer for fetched film details on their way into a watchlist. Results collect here
+    and go in with apply_metadata every METADATA_BATCH films (or METADATA_BATCH_SECONDS), so a
+    background fetch never writes row by row while a pick is reading the same DataFrame.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.pending = {}  # label -> slim metadata
+        self.flushed_at = time.monotonic()
+
+    def add(self, label, metadata):
+        self.pending[label] = metadata
+        if len(self.pending) >= config.METADATA_BATCH or time.monotonic() - self.flushed_at >= config.METADATA_BATCH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            apply_metadata(self.df, list(self.pending), list(self.pending.values()))
+            self.pending = {}
+        self.flushed_at = time.monotonic()
+
+def extract_json_ld(html_text, backend=None):
+    """Return the raw JSON-LD script text from a film page, or None"""
+    backend = parser_backend(backend)
+    if backend == "regex":
+        match = JSON_LD_RE.search(html_text)
+        if match:
+            return match.group(1)
+    elif backend == "selectolax":
+        node = selectolax_parser()(html_text).css_first('script[type="application/ld+json"]')
+        if node:
+            return node.text(deep=True)
+
+    # BeautifulSoup, also the fallback when the fast path finds nothing
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html_text, "html.parser")
+    json_data = soup.find("script", {"type": "application/ld+json"})
+    return json_data.string if json_data else None
+
+@timed("parse_film_metadata")
+def parse_film_metadata(html_text, backend=None):
+    """Parse the JSON-LD movie metadata out of a film page"""
+    json_str = extract_json_ld(html_text, backend)
+    if not json_str:
+        if config.DEBUG:
+            print("Movie metadata not found in the page")
+        raise Exception("Movie metadata not found in the page")
+    
+    json_str = json_str.replace("/* <![CDATA[ */", "").replace("/* ]]> */", "").strip()
+    movie_data = json.loads(json_str)
+    
+    # Letterboxd's JSON-LD has no running time, but the page footer does ("123&nbsp;mins")
+    if "duration" not in movie_data:
+        runtime = RUNTIME_RE.search(html_text)
+        if runtime:
+            movie_data["duration"] = f"PT{runtime.group(1)}M"
+    return movie_data
+
+@timed("fetch_metadata")
+def fetch_single_metadata(uri, session=None):
+    headers = {"User-Agent": "Mozilla/5.0"}
+
+    response = http_get(uri, session, headers=headers, cache=True)
+    if response.status_code != 200:
+        raise FetchError(f"Could not load movie page ({response.status_code})")
+
+    # Only the fields the picker uses are kept; the full JSON-LD carries the cast, reviews and more
+    return slim_metadata(parse_response(parse_film_response, response))
+
+def metadata_key(row):
+    """Key a watchlist row in the metadata store by its slug, falling back to the LID"""
+    return row.get("Slug") or row.get("LID") or row.get("Letterboxd URI")
+
+def metadata_keys(df):
+    """metadata_key for every row of a watchlist, as a Series"""
+    keys = df["Slug"].astype(object)
+    for fallback in ("LID", "Letterboxd URI"):
+        keys = keys.where(keys.notna() & (keys != ""), df[fallback].astype(object))
+    return keys
+
+def load_cached_metadata_many(keys):
+    """Return {key: metadata} for every key with unexpired metadata in memory or on disk"""
+    now = time.time()
+    found = {}
+    missing = []
+    for key in keys:
+        entry = metadata_cache.get(key)
+        if entry and now - entry[1] < config.METADATA_TTL:
+            found[key] = entry[0]
+        else:
+            missing.append(key)
+    
+    if missing and config.PERSIST_CACHE:
+        try:
+            conn = cache_connection()
+            # Stay well under SQLite's bound parameter limit
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT film_key, fetched_at, data FROM film_metadata WHERE fetched_at > ? AND film_key IN ({','.join('?' * len(chunk))})",
+                    (now - config.METADATA_TTL, *chunk)).fetchall()
+                for key, fetched_at, data in rows:
+                    metadata = slim_metadata(json.loads(data)) # Records stored before slimming hold full JSON-LD
+                    metadata_cache[key] = (metadata, fetched_at)
+                    found[key] = metadata
+            conn.close()
+        except sqlite3.Error as e:
+            if config.DEBUG:
+                print(f"Could not read cached metadata: {e}")
+    metrics.count("cache_hits_total", len(keys) - len(missing), cache="metadata")
+    metrics.count("cache_hits_total", len(found) - (len(keys) - len(missing)), cache="metadata_disk")
+    metrics.count("cache_misses_total", len(keys) - len(found), cache="metadata")
+    return found
+
+def load_cached_metadata(key):
+    """Return unexpired metadata for one film, or None"""
+    return load_cached_metadata_many([key]).get(key)
+
+def save_cached_metadata(key, metadata):
+    """Store a film's metadata in memory and on disk"""
+    fetched_at = time.time()
+    metadata_cache[key] = (metadata, fetched_at)
+    if not config.PERSIST_CACHE:
+        return
+    try:
+        conn = cache_connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO film_metadata VALUES (?, ?, ?)", (key, fetched_at, json.dumps(metadata)))
+        conn.close()
+    except sqlite3.Error as e:
+        if config.DEBUG:
+            print(f"Could not save metadata for {key}: {e}")
+
+def get_movie_metadata(row, session=None):
+    """Get metadata for a watchlist row from the metadata store, fetching it only on a miss"""
+    key = metadata_key(row)
+    metadata = load_cached_metadata(key)
+    if metadata is None:
+        metadata = metadata_flights.do(key, fetch_movie_metadata, key, row["Letterboxd URI"], session)
+    return metadata
+
+def fetch_movie_metadata(key, uri, session=None):
+    """Download and store one film's metadata, unless a call that just finished already stored it"""
+    entry = metadata_cache.get(key)
+    if entry and time.time() - entry[1] < config.METADATA_TTL:
+        return entry[0]
+    metadata = fetch_single_metadata(uri, session)
+    save_cached_metadata(key, metadata)
+    return metadata
+
+def cached_usernames():
+    """Users with a stored watchlist: on disk, or in memory when PERSIST_CACHE is off"""
+    if not config.PERSIST_CACHE:
+        with watchlists_lock:
+            return [key for key in watchlists if isinstance(key, str)]
+    try:
+        conn = cache_connection()
+        usernames = [username for (username,) in conn.execute("SELECT username FROM watchlist_info ORDER BY username")]
+        conn.close()
+    except sqlite3.Error as e:
+        if config.DEBUG:
+            print(f"Could not list cached watchlists: {e}")
+        return []
+    return usernames
+
+def iter_cached_watchlists(usernames=None):
+    """Yield (username, df) for complete stored watchlists, loading one at a time"""
+    for username in usernames or cached_usernames():
+        df = watchlists.get(username)
+        if df is None and config.PERSIST_CACHE:
+            df = load_cached_watchlist(username)
+        if df is not None and not df.empty and not df.attrs.get("partial"):
+            yield username, df
+
+def iter_cached_intersections(usernames=None):
+    """Yield (usernames, df) for the complete intersections held in memory, then those only stored on disk"""
+    with watchlists_lock:
+        entries = [(key, df) for key, df in watchlists.items() if isinstance(key, tuple)]
+    
+    def wanted(key):
+        return usernames is None or set(key) <= set(usernames)
+    
+    for key, df in entries:
+        if not df.attrs.get("partial") and wanted(key):
+            yield key, df
+    if config.PERSIST_CACHE:
+        in_memory = {key for key, _ in entries}
+        for key in cached_intersection_keys():
+            if key not in in_memory and wanted(key):
+                df = load_cached_intersection(key)
+                if df is not None:
+                    yield key, df
+
+def iter_cached_metadata(keys=None):
+    """Yield batches of (key, fetched_at, metadata) for unexpired stored metadata, optionally only for `keys`"""
+    oldest = time.time() - config.METADATA_TTL
+    if not config.PERSIST_CACHE:
+        entries = [(key, fetched_at, metadata) for key, (metadata, fetched_at) in list(metadata_cache.items())
+                   if fetched_at > oldest and (keys is None or key in keys)]
+        for i in range(0, len(entries), config.EXPORT_BATCH):
+            yield entries[i:i + config.EXPORT_BATCH]
+        return
+    try:
+        conn = cache_connection()
+        cursor = conn.execute("SELECT film_key, fetched_at, data FROM film_metadata WHERE fetched_at > ? ORDER BY film_key", (oldest,))
+        while rows := cursor.fetchmany(config.EXPORT_BATCH):
+            batch = [(key, fetched_at, slim_metadata(json.loads(data))) for key, fetched_at, data in rows if keys is None or key in keys]
+            if batch:
+                yield batch
+        conn.close()
+    except sqlite3.Error as e:
+        if config.DEBUG:
+            print(f"Could not read cached metadata: {e}")
+
+def export_format(path):
+    """The export format a path implies: jsonl for .jsonl and .jsonl.gz files, otherwise parquet"""
+    return "jsonl" if re.search(r"\.jsonl(\.gz)?$", path) else "parquet"
+
+def open_jsonl(path, mode):
+    return gzip.open(path, mode + "t", encoding="utf-8") if path.endswith(".gz") else open(path, mode, encoding="utf-8")
+
+def watchlist_rows(df):
+    """A watchlist's rows as plain lists in WATCHLIST_COLUMNS order"""
+    return [list(row) for row in zip(*(df[column].tolist() for column in WATCHLIST_COLUMNS))]
+
+def watchlist_table(df, key_column, key, fetched_at=None, num_entries=None):
+    """A watchlist as an Arrow table: the fetch_page_movies columns (Film ID as int32) plus its key and fetch info"""
+    rows = len(df)
+    columns = {
+        key_column: pa.array([key] * rows, pa.string()),
+        "Fetched At": pa.array([fetched_at] * rows, pa.float64()),
+        "Num Entries": pa.array([num_entries] * rows, pa.int64()),
+    }
+    for column in WATCHLIST_COLUMNS:
+        if column == "Film ID":
+            columns[column] = pa.array(pd.to_numeric(df[column], errors="coerce").fillna(0).astype("int32"), pa.int32())
+        else:
+            columns[column] = pa.array(df[column].astype(str).tolist(), pa.string())
+    return pa.table(columns)
+
+def metadata_table(batch):
+    """A batch of (key, fetched_at, metadata) as an Arrow table with one typed column per slim metadata field"""
+    return pa.table({
+        "key": pa.array([key for key, _, _ in batch], pa.string()),
+        "fetched_at": pa.array([fetched_at for _, fetched_at, _ in batch], pa.float64()),
+        "directors": pa.array([meta.get("directors") or [] for _, _, meta in batch], pa.list_(pa.string())),
+        "genres": pa.array([meta.get("genres") or [] for _, _, meta in batch], pa.list_(pa.string())),
+        "rating": pa.array([meta.get("rating") for _, _, meta in batch], pa.float64()),
+        "runtime": pa.array([meta.get("runtime") for _, _, meta in batch], pa.int32()),
+        "image": pa.array([meta.get("image") for _, _, meta in batch], pa.string()),
+    })
+
+def export_records(usernames=None):
+    """
+    Yield the stored watchlists, then intersections, then metadata as export records, one at
+    a time. With `usernames`, only their watchlists, their intersections and the metadata of
+    films on those lists are exported.
+    """
+    keys = set() if usernames else None
+    for username, df in iter_cached_watchlists(usernames):
+        if keys is not None:
+            keys.update(df["Slug"])
+            keys.update(df["LID"])
+        yield {"type": "watchlist", "username": username, "fetched_at": df.attrs.get("fetched_at") or time.time(),
+               "num_entries": df.attrs.get("num_entries"), "films": df}
+    for users, df in iter_cached_intersections(usernames):
+        yield {"type": "intersection", "users": list(users), "films": df}
+    for batch in iter_cached_metadata(keys):
+        yield {"type": "metadata", "batch": batch}
+
+def write_jsonl(path, records):
+    with open_jsonl(path, "w") as f:
+        for record in records:
+            if record["type"] == "metadata":
+                for key, fetched_at, metadata in record["batch"]:
+                    f.write(json.dumps({"type": "metadata", "key": key, "fetched_at": fetched_at, "metadata": metadata}) + "\n")
+                continue
+            record = dict(record, columns=WATCHLIST_COLUMNS, rows=watchlist_rows(record.pop("films")))
+            f.write(json.dumps(record) + "\n")
+
+PARQUET_FILES = {"watchlist": "watchlists.parquet", "intersection": "intersections.parquet",
+                 "metadata": "metadata.parquet", "index": "index.parquet"}
+
+def write_parquet(path, records):
+    """
+    Write watchlists.parquet, intersections.parquet and metadata.parquet into the `path`
+    directory, plus index.parquet listing each watchlist and intersection in row group order
+    with its key and fetch info. Empty intersections have no row group, only an index entry.
+    """
+    os.makedirs(path, exist_ok=True)
+    writers = {}
+    index = []
+    try:
+        for record in records:
+            kind = record["type"]
+            if kind == "watchlist":
+                table = watchlist_table(record["films"], "Username", record["username"], record["fetched_at"], record["num_entries"])
+                index.append((kind, record["username"], record["fetched_at"], record["num_entries"], len(record["films"])))
+            elif kind == "intersection":
+                table = watchlist_table(record["films"], "Users", ",".join(record["users"]))
+                index.append((kind, ",".join(record["users"]), None, None, len(record["films"])))
+            else:
+                table = metadata_table(record["batch"])
+            if kind not in writers:
+                writers[kind] = pq.ParquetWriter(os.path.join(path, PARQUET_FILES[kind]), table.schema)
+            if table.num_rows:
+                writers[kind].write_table(table) # One row group per watchlist or metadata batch
+    finally:
+        for writer in writers.values():
+            writer.close()
+    kinds, keys, fetched_at, num_entries, rows = zip(*index) if index else ([],) * 5
+    pq.write_table(pa.table({
+        "Kind": pa.array(kinds, pa.string()),
+        "Key": pa.array(keys, pa.string()),
+        "Fetched At": pa.array(fetched_at, pa.float64()),
+        "Num Entries": pa.array(num_entries, pa.int64()),
+        "Rows": pa.array(rows, pa.int64()),
+    }), os.path.join(path, PARQUET_FILES["index"]))
+
+def read_jsonl(path):
+    with open_jsonl(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def parquet_index(path):
+    """{kind: [(key, fetched_at, num_entries, rows), ...]} from index.parquet, or from the row groups of an export made without one"""
+    filename = os.path.join(path, PARQUET_FILES["index"])
+    if os.path.exists(filename):
+        index = defaultdict(list)
+        for row in pq.read_table(filename).to_pylist():
+            index[row["Kind"]].append((row["Key"], row["Fetched At"], row["Num Entries"], row["Rows"]))
+        return index
+    index = {}
+    for kind, key_column in (("watchlist", "Username"), ("intersection", "Users")):
+        filename = os.path.join(path, PARQUET_FILES[kind])
+        if os.path.exists(filename):
+            parquet = pq.ParquetFile(filename)
+            index[kind] = [(*(parquet.read_row_group(group, columns=[column]).column(0)[0].as_py()
+                              for column in (key_column, "Fetched At", "Num Entries")), parquet.metadata.row_group(group).num_rows)
+                           for group in range(parquet.num_row_groups)]
+    return index
+
+def read_parquet(path):
+    """Yield the records of a Parquet export, reading the memory-mapped files one row group at a time"""
+    index = parquet_index(path)
+    for kind in ("watchlist", "intersection"):
+        filename = os.path.join(path, PARQUET_FILES[kind])
+        parquet = pq.ParquetFile(filename, memory_map=True) if os.path.exists(filename) else None
+        groups = iter(range(parquet.num_row_groups if parquet else 0))
+        for key, fetched_at, num_entries, rows in index.get(kind, []):
+            if rows:
+                films = parquet.read_row_group(next(groups)).select(WATCHLIST_COLUMNS).to_pandas()
+            else:
+                films = pd.DataFrame(columns=WATCHLIST_COLUMNS)
+            if kind == "watchlist":
+                yield {"type": kind, "username": key, "fetched_at": fetched_at, "num_entries": num_entries, "films": films}
+            else:
+                yield {"type": kind, "users": key.split(","), "films": films}
+    filename = os.path.join(path, PARQUET_FILES["metadata"])
+    if os.path.exists(filename):
+        for batch in pq.ParquetFile(filename, memory_map=True).iter_batches(batch_size=config.EXPORT_BATCH):
+            for row in batch.to_pylist():
+                yield {"type": "metadata", "key": row.pop("key"), "fetched_at": row.pop("fetched_at"), "metadata": row}
+
+def check_export_format(fmt):
+    if fmt not in ("parquet", "jsonl"):
+        raise Exception(f"Unknown export format {fmt!r} (expected parquet or jsonl)")
+    if fmt == "parquet" and pa is None:
+        raise Exception("Parquet exports need pyarrow (pip install pyarrow); use a .jsonl path instead")
+
+@timed("export_cache")
+def export_cache(path, usernames=None, fmt=None):
+    """
+    Write the stored watchlists, intersections and film metadata to `path`, streaming one
+    watchlist at a time so thousands of users never have to fit in memory together.
+    "parquet" writes a directory of Parquet files (needs pyarrow); "jsonl" writes one JSON
+    record per line, gzipped if the path ends in .gz. By default the path picks the format.
+    Returns {record type: count}.
+    """
+    fmt = fmt or export_format(path)
+    check_export_format(fmt)
+    counts = defaultdict(int)
+
+    def counted(records):
+        for record in records:
+            counts[record["type"]] += len(record["batch"]) if record["type"] == "metadata" else 1
+            yield record
+
+    (write_parquet if fmt == "parquet" else write_jsonl)(path, counted(export_records(usernames)))
+    print(f"Exported {counts['watchlist']} watchlists, {counts['intersection']} intersections "
+          f"and {counts['metadata']} film details to {path}")
+    return dict(counts)
+
+def import_metadata_batch(batch):
+    """Store a batch of imported (key, fetched_at, metadata), keeping the fetch times"""
+    batch = [(key, fetched_at, slim_metadata(metadata)) for key, fetched_at, metadata in batch]
+    if not config.PERSIST_CACHE:
+        for key, fetched_at, metadata in batch:
+            metadata_cache[key] = (metadata, fetched_at)
+        return
+    for key, _, _ in batch:
+        metadata_cache.pop(key, None) # Read back from disk on next use
+    try:
+        conn = cache_connection()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO film_metadata VALUES (?, ?, ?)",
+                             [(key, fetched_at, json.dumps(metadata)) for key, fetched_at, metadata in batch])
+        conn.close()
+    except sqlite3.Error as e:
+        if config.DEBUG:
+            print(f"Could not import metadata: {e}")
+
+@timed("import_cache")
+def import_cache(path, fmt=None):
+    """
+    Load an export_cache export into the watchlist, intersection and metadata stores. They go
+    to the disk cache (or memory when PERSIST_CACHE is off) and replace any stored copy, so a
+    warm cache can be shipped to another machine. Returns {record type: count}.
+    """
+    fmt = fmt or export_format(path)
+    check_export_format(fmt)
+    counts = defaultdict(int)
+    metadata_batch = []
+    for record in (read_parquet(path) if fmt == "parquet" else read_jsonl(path)):
+        kind = record["type"]
+        counts[kind] += 1
+        if kind == "metadata":
+            metadata_batch.append((record["key"], record["fetched_at"], record["metadata"]))
+            if len(metadata_batch) >= config.EXPORT_BATCH:
+                import_metadata_batch(metadata_batch)
+                metadata_batch = []
+            continue
+        films = record.get("films")
+        df = compact_watchlist(films) if films is not None else watchlist_frame(record["rows"])
+        if kind == "intersection":
+            # Follows its members' watchlists in every export, so storing them hasn't dropped it again
+            key = tuple(sorted(record["users"]))
+            if config.PERSIST_CACHE:
+                save_cached_intersection(key, df)
+                watchlists.pop(key, None) # Loaded from disk on next use
+            else:
+                watchlists[key] = df
+            continue
+        username = record["username"]
+        df.attrs["fetched_at"], df.attrs["num_entries"] = record["fetched_at"], record["num_entries"]
+        if config.PERSIST_CACHE:
+            save_cached_watchlist(username, df, record["num_entries"], record["fetched_at"])
+        with watchlists_lock:
+            invalidate_intersections(username)
+            if config.PERSIST_CACHE:
+                watchlists.pop(username, None) # Loaded from disk, and revalidated, on next use
+            else:
+                watchlists[username] = df
+    if metadata_batch:
+        import_metadata_batch(metadata_batch)
+    print(f"Imported {counts['watchlist']} watchlists, {counts['intersection']} intersections "
+          f"and {counts['metadata']} film details from {path}")
+    return dict(counts)
+
+def read_warm_file(path):
+    """
+    Read the users and groups for `random_movie warm`: one per line, either a username or a
+    group of usernames separated by commas or spaces. Blank lines and # comments are skipped.
+    Returns (usernames, groups), where usernames also includes every group member.
+    """
+    usernames, groups = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            names = list(dict.fromkeys(line.split("#", 1)[0].replace(",", " ").split()))
+            usernames.extend(names)
+            if len(names) > 1:
+                groups.append(names)
+    return list(dict.fromkeys(usernames)), groups
+
+def progress_reporter(label, total, interval=2.0):
+    """A callback that counts finished items and prints `label: done/total` every `interval` seconds and at the end"""
+    state = {"done": 0, "printed": 0.0}
+    lock = threading.Lock()
+
+    def done(count=1):
+        with lock:
+            state["done"] += count
+            now = time.monotonic()
+            if state["done"] >= total or now - state["printed"] >= interval:
+                state["printed"] = now
+                print(f"{label}: {state['done']}/{total}", flush=True)
+    return done
+
+def warm_watchlists(usernames, summary, fresh_for, workers):
+    """
+    Bring every user's stored watchlist up to date and load it into memory. Lists checked
+    within `fresh_for` seconds are left alone; older ones are revalidated, and users with no
+    stored list are scraped, a batch of FETCH_WORKERS users at a time. Returns the users
+    whose watchlist couldn't be loaded.
+    """
+    done = progress_reporter("Watchlists", len(usernames))
+    failed = set()
+    stale, missing = [], []
+    for username in usernames:
+        cached = load_cached_watchlist(username)
+        if cached is None:
+            missing.append(username)
+            continue
+        watchlists[username] = cached
+        revalidated_users.add(username) # Checked here rather than in a background thread
+        if time.time() - cached.attrs["fetched_at"] < fresh_for:
+            summary["watchlists_fresh"] += 1
+            done()
+        else:
+            stale.append(username)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for username, refreshed in zip(stale, pool.map(revalidate_watchlist, stale)):
+            if refreshed is None:
+                failed.add(username) # The older stored copy is still used
+            summary["watchlists_failed" if refreshed is None else "watchlists_updated" if refreshed else "watchlists_checked"] += 1
+            done()
+
+    for i in range(0, len(missing), config.FETCH_WORKERS):
+        for username, (df, total_entries) in scrape_watchlists(missing[i:i + config.FETCH_WORKERS]).items():
+            store_watchlist(username, df, total_entries)
+            if df.attrs.get("partial") or df.empty:
+                failed.add(username)
+            # Empty lists (or users that don't exist) aren't stored, so they are looked up again next time
+            summary["watchlists_failed" if df.attrs.get("partial") else "watchlists_empty" if df.empty else "watchlists_fetched"] += 1
+            done()
+    return failed
+
+def warm_films(usernames, summary, posters, workers):
+    """Fetch metadata, and posters, for every film on the users' watchlists that isn't stored yet"""
+    rows = {}
+    for username in usernames:
+        df = watchlists.get(username)
+        if df is not None and not df.attrs.get("partial"):
+            for row in df[WATCHLIST_COLUMNS].to_dict("records"):
+                rows.setdefault(metadata_key(row), row)
+    stored = load_cached_metadata_many(list(rows))
+
+    def needs_work(key, row):
+        if key not in stored:
+            return True
+        metadata = stored[key]
+        return posters and bool(metadata.get("image")) and not os.path.exists(poster_cache_path(poster_key(metadata, row.get("Film ID"))))
+
+    def warm_film(row):
+        session = fetch_session()
+        metadata = get_movie_metadata(row, session)
+        if posters and metadata.get("image"):
+            prefetch_poster(metadata, session, row.get("Film ID"))
+
+    todo = [row for key, row in rows.items() if needs_work(key, row)]
+    summary["films_stored"] += len(rows) - len(todo)
+    done = progress_reporter("Films", len(todo))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(warm_film, row) for row in todo]
+        for future in as_completed(futures):
+            try:
+                future.result()
+                summary["films_fetched"] += 1
+            except RequestBudgetExhausted:
+                summary["films_skipped"] += 1
+            except Exception as e:
+                if config.DEBUG:
+                    print(f"Could not warm a film: {e}")
+                summary["films_failed"] += 1
+            done()
+
+@timed("warm")
+def warm_cache(usernames, groups=(), posters=True, fresh_for=None, workers=8):
+    """
+    Prefetch every watchlist, group intersection, film's metadata and poster into the
+    persistent caches, so later picks are served without touching the network. Anything
+    already stored and fresh is skipped, so an interrupted run picks up where it stopped.
+    fresh_for defaults to WATCHLIST_FRESH_FOR. Returns {outcome: count}.
+    """
+    if not config.PERSIST_CACHE:
+        raise Exception("Warming the cache needs PERSIST_CACHE")
+    fresh_for = config.WATCHLIST_FRESH_FOR if fresh_for is None else fresh_for
+    summary = defaultdict(int)
+    usernames = list(dict.fromkeys([*usernames, *(user for group in groups for user in group)]))
+    failed = warm_watchlists(usernames, summary, fresh_for, workers)
+
+    for group in groups:
+        if failed & set(group):
+            summary["groups_failed"] += 1
+            continue
+        try:
+            fetch_multiple_watchlists(group)
+            summary["groups"] += 1
+        except Exception as e:
+            print(f"Could not intersect {', '.join(group)}: {e}")
+            summary["groups_failed"] += 1
+
+    warm_films(usernames, summary, posters, workers)
+    if request_budget == 0:
+        summary["budget_exhausted"] = 1
+    return dict(summary)
+
+def poster_url(film_id, slug):
+    sep_film_id = ".".join(list(str(film_id)))
+    return f"https://a.ltrbxd.com/resized/film-poster/{sep_film_id}/{film_id}-{slug}-0-460-0-690-crop.jpg"
+
+def get_shared_session(pool_size=50):
+    """One requests.Session (and connection pool) for the whole process"""
+    global shared_session
+    with shared_session_lock:
+        if shared_session is None:
+            shared_session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            shared_session.mount("https://", adapter)
+            shared_session.mount("http://", adapter)
+        return shared_session
+
+def cache_main(command, argv):
+    """Command line entry point for `python -m random_movie export|import PATH`"""
+    import argparse
+    parser = argparse.ArgumentParser(prog=f"random_movie {command}", description=(
+        "Write the cached watchlists and film metadata to a Parquet directory or JSON-lines file" if command == "export"
+        else "Load watchlists and film metadata written by `random_movie export` into the cache"))
+    parser.add_argument("path", help="Parquet directory, or a .jsonl / .jsonl.gz file")
+    parser.add_argument("--format", choices=["parquet", "jsonl"], help="override the format implied by the path")
+    if command == "export":
+        parser.add_argument("--users", help="comma-separated usernames to export (default: every cached user)")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args(argv)
+    config.DEBUG = config.DEBUG or args.debug
+    if command == "export":
+        usernames = [user.strip() for user in args.users.split(",") if user.strip()] if args.users else None
+        export_cache(args.path, usernames, args.format)
+    else:
+        import_cache(args.path, args.format)
+
+def warm_main(argv):
+    """Command line entry point for `python -m random_movie warm FILE`, e.g. from a nightly job"""
+    global request_budget
+    import argparse
+    parser = argparse.ArgumentParser(prog="random_movie warm", description=(
+        "Prefetch watchlists, group intersections, film details and posters into the persistent caches. "
+        "Re-running after an interruption skips everything already stored."))
+    parser.add_argument("path", help="file with one username, or one comma-separated group, per line (# starts a comment)")
+    parser.add_argument("--max-requests", type=int, help="stop sending requests after this many (a re-run continues)")
+    parser.add_argument("--rate", type=float, help="starting requests per second per host (default: RATE_LIMIT)")
+    parser.add_argument("--workers", type=int, default=8, help="watchlist checks and film fetches run at once")
+    parser.add_argument("--fresh-for", type=float, default=6, help="hours after which a stored watchlist is checked again")
+    parser.add_argument("--no-posters", action="store_true", help="only fetch film details")
+    parser.add_argument("--parse-processes", type=int, default=config.PARSE_PROCESSES, help="parse pages in this many processes")
+    parser.add_argument("--export", help="also write the warmed cache, with intersections, to this path (see `random_movie export`)")
+    parser.add_argument("--letterboxd", help="base URL of a Letterboxd stand-in, e.g. http://127.0.0.1:9000")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args(argv)
+    if args.letterboxd:
+        base = args.letterboxd.rstrip("/")
+        config.WATCHLIST_URL = base + "/{}/watchlist/page/{}/"
+        config.FILM_URL = base + "/film/{}/"
+    config.DEBUG = config.DEBUG or args.debug
+    config.RATE_LIMIT = args.rate or config.RATE_LIMIT
+    config.PARSE_PROCESSES = args.parse_processes
+    request_budget = args.max_requests
+
+    usernames, groups = read_warm_file(args.path)
+    print(f"Warming {len(usernames)} users and {len(groups)} groups")
+    summary = warm_cache(usernames, groups, posters=not args.no_posters, fresh_for=args.fresh_for * 3600, workers=args.workers)
+    print("Watchlists: {watchlists_fetched} fetched, {watchlists_updated} updated, {watchlists_checked} unchanged, "
+          "{watchlists_fresh} fresh, {watchlists_empty} empty or missing, {watchlists_failed} failed".format_map(defaultdict(int, summary)))
+    print("Groups: {groups} intersected, {groups_failed} failed".format_map(defaultdict(int, summary)))
+    print("Films: {films_fetched} fetched, {films_stored} already stored, {films_failed} failed, "
+          "{films_skipped} skipped".format_map(defaultdict(int, summary)))
+    if args.export:
+        request_budget = None
+        export_cache(args.export, usernames)
+    if summary.get("budget_exhausted"):
+        print(f"Stopped after {args.max_requests} requests; run again to continue")
+    if summary.get("budget_exhausted") or any(summary.get(key) for key in ("watchlists_failed", "groups_failed", "films_failed")):
+        sys.exit(1)
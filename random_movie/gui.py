@@ -0,0 +1,407 @@
+"""
+The Tk window: `python -m random_movie`. Picks run on worker threads and report back
+through ui_queue, which the Tk thread drains every UI_POLL_MS.
+"""
+import sys
+import queue
+import threading
+import os, json, time
+
+# Only the window is imported up front; pandas and the network stack load once it is showing
+import tkinter as tk
+from tkinter import messagebox
+
+from . import config
+from .core import (Superseded, apply_metadata, fetch_multiple_watchlists, fetch_watchlist, get_poster_image,
+    metadata_count, metrics, pd, preload_modules, timed)
+from .sampling import (PRIORITY_PICK, fetch_metadata_background, metadata_scheduler, needs_metadata,
+    next_pick, prepick, start_background_metadata_fetch)
+
+# Letterboxd color scheme
+BG_COLOR = "#2c3440"  # Dark charcoal
+FG_COLOR = "#9ab"     # Light grey-blue
+ACCENT_COLOR = "#00e054"  # Letterboxd green
+BUTTON_COLOR = "#445566"  # Darker button
+ENTRY_COLOR = "#1a2028"   # Darker input fields
+
+# Weighting choices shown in the GUI
+WEIGHT_CHOICES = {"Any film": None, "Higher rated": "rating", "Oldest added": "oldest"}
+
+# Messages from pick workers to the Tk thread: (generation, kind, payload)
+ui_queue = queue.Queue()
+# Bumped on every click, so older pick workers know they have been superseded
+pick_generation = 0
+
+# Watchlist whose metadata the background fetch is working through
+current_background_watchlist_key = None
+
+class PickCancelled(Superseded):
+    """Raised inside a pick worker once a newer pick has been started"""
+
+def update_ui_status(message):
+    status_label.config(text=message)
+
+@timed("pick")
+def pick_worker(generation, usernames, options=None):
+    """Fetch, sample and load a movie off the Tk thread, reporting back through ui_queue"""
+    global current_background_watchlist_key
+    
+    def post(kind, payload=None):
+        ui_queue.put((generation, kind, payload))
+    
+    def check_cancelled():
+        if generation != pick_generation:
+            raise PickCancelled()
+    
+    def progress(username, pages_done, total_pages):
+        check_cancelled()
+        post("status", f"Fetching {username}: page {pages_done} of {total_pages}...")
+    
+    options = options or {}
+    try:
+        # Create a key to identify this specific watchlist
+        if len(usernames) == 1:
+            watchlist_key = usernames[0]
+            post("status", f"Fetching watchlist for {usernames[0]}...")
+            full_watchlist = fetch_watchlist(usernames[0], export_csv=config.SAVE_WATCHLISTS, progress=progress)
+        else:
+            watchlist_key = tuple(sorted(usernames))
+            post("status", f"Fetching watchlists for {len(usernames)} users...")
+            full_watchlist = fetch_multiple_watchlists(usernames, export_csv=config.SAVE_WATCHLISTS, progress=progress)
+        check_cancelled()
+        
+        if full_watchlist.empty:
+            raise Exception("No movies found in the intersection of all users' watchlists.")
+        
+        # Update status with movie count
+        incomplete = " (some pages could not be loaded)" if full_watchlist.attrs.get("partial") else ""
+        if len(usernames) == 1:
+            post("status", f"Found {len(full_watchlist)} movies in watchlist{incomplete}")
+        else:
+            post("status", f"Found {len(full_watchlist)} movies common to all {len(usernames)} users{incomplete}")
+        
+        # Only start background metadata fetching if this is a different watchlist
+        if current_background_watchlist_key != watchlist_key:
+            current_background_watchlist_key = watchlist_key
+            start_background_metadata_fetch(full_watchlist)
+        
+        if needs_metadata(**options) and metadata_count(full_watchlist) < len(full_watchlist):
+            # Filters need every film's details; already stored ones are filled in without any requests
+            post("status", f"Fetching details for {len(full_watchlist)} movies to apply filters...")
+            fetch_metadata_background(full_watchlist, prefetch_posters=False)  # The picked film's poster is fetched below
+            check_cancelled()
+        
+        # Use a film picked (and prefetched) on an earlier click if there is one
+        sample_index, sample_row = next_pick(watchlist_key, full_watchlist, options)
+        
+        # Try to get metadata from DataFrame first, then force fetch
+        meta = None
+        if 'Metadata' in sample_row and pd.notna(sample_row['Metadata']) and sample_row['Metadata'] is not None:
+            meta = sample_row['Metadata']
+        else:
+            # Jump the film to the front of the scheduler, sharing any request already in flight
+            future = metadata_scheduler.request(sample_row, PRIORITY_PICK)
+            if not future.done():
+                post("status", "Fetching movie details...")
+            meta = future.result(timeout=30)
+            # Store it back in the DataFrame for future use
+            apply_metadata(full_watchlist, [sample_index], [meta])
+        check_cancelled()
+        
+        # Download and decode the poster here; only the PhotoImage has to be made on the Tk thread
+        img = get_poster_image(meta, key=sample_row.get("Film ID"))
+        check_cancelled()
+        
+        # Get the next clicks' films ready while this one is on screen
+        prepick(watchlist_key, full_watchlist, options)
+        post("result", {
+            "title": f"{sample_row['Name']} ({sample_row['Year']})",
+            "uri": sample_row["Letterboxd URI"],
+            "meta": meta,
+            "image": img,
+        })
+        metrics.log_json("pick", users=usernames)
+    except PickCancelled:
+        if config.DEBUG:
+            print("Pick superseded by a newer one")
+    except Exception as e:
+        print(f"Error: {e}")
+        post("error", str(e))
+
+def show_pick(result):
+    """Fill in the result widgets on the Tk thread"""
+    import webbrowser
+    from PIL import ImageTk
+    meta = result["meta"]
+    uri = result["uri"]
+    
+    # Clear status and shrink status box
+    status_label.config(text="")
+
+    # Display title
+    result_label.config(text=result["title"])
+    # Create clickable link
+    link_label.config(text="View on Letterboxd", fg=ACCENT_COLOR, cursor="pointinghand")
+    link_label.bind("<Button-1>", lambda _: webbrowser.open_new(uri))
+    # Display director
+    director = meta["directors"][0] if meta.get("directors") else "Unknown"
+    director_label.config(text=f"Director: {director}")
+    # Display genre
+    genre = meta["genres"][0] if meta.get("genres") else "Unknown"
+    genre_label.config(text=f"Genre: {genre}")
+    # Display rating
+    rating = meta.get("rating") if meta.get("rating") is not None else "N/A"
+    rating_label.config(text=f"Rating: {rating}")
+    # Show poster
+    photo = ImageTk.PhotoImage(result["image"])
+    poster_label.config(image=photo)
+    poster_label.image = photo  # Save reference to avoid GC
+
+def poll_ui_queue():
+    """Apply messages from the current pick worker, then reschedule"""
+    try:
+        while True:
+            generation, kind, payload = ui_queue.get_nowait()
+            if generation != pick_generation:
+                continue  # From a pick that has since been replaced
+            if kind == "status":
+                update_ui_status(payload)
+            elif kind == "result":
+                show_pick(payload)
+            elif kind == "error":
+                status_label.config(text="")
+                messagebox.showerror("Error", payload)
+    except queue.Empty:
+        pass
+    root.after(config.UI_POLL_MS, poll_ui_queue)
+
+# GUI Setup
+def on_submit():
+    """Start a pick in a worker thread; clicking again cancels the one in flight"""
+    global pick_generation
+    pick_generation += 1
+    
+    # Clear previous results and show loading status
+    result_label.config(text="")
+    director_label.config(text="")
+    genre_label.config(text="")
+    rating_label.config(text="")
+    poster_label.config(image="")
+    poster_label.image = None
+    link_label.config(text="")
+    link_label.unbind("<Button-1>")
+    update_ui_status("Loading watchlists...")
+    
+    usernames_text = username_entry.get("1.0", "end-1c").strip().replace(",", "\n").split()
+    usernames = [u.strip() for u in usernames_text if u.strip()]
+    if not usernames:
+        status_label.config(text="")
+        messagebox.showerror("Error", "Enter at least one username.")
+        return
+    try:
+        options = read_pick_options()
+    except ValueError:
+        status_label.config(text="")
+        messagebox.showerror("Error", "Years, rating and runtime must be numbers.")
+        return
+    
+    threading.Thread(target=pick_worker, args=(pick_generation, usernames, options), daemon=True).start()
+
+def read_pick_options():
+    """Collect the filter and weighting controls into pick options; raises ValueError on bad numbers"""
+    def number(entry, kind):
+        text = entry.get().strip()
+        return kind(text) if text else None
+    
+    return {
+        "weight": WEIGHT_CHOICES[weight_var.get()],
+        "no_repeat": bool(no_repeat_var.get()),
+        "genre": genre_entry.get().strip() or None,
+        "director": director_entry.get().strip() or None,
+        "year": (number(year_from_entry, int), number(year_to_entry, int)),
+        "runtime": (None, number(max_runtime_entry, int)),
+        "min_rating": number(min_rating_entry, float),
+    }
+
+def main():
+    """Build the window and run the Tk main loop"""
+    global root, username_entry, genre_entry, director_entry, year_from_entry, year_to_entry, min_rating_entry
+    global max_runtime_entry, weight_var, no_repeat_var, status_label, result_label, director_label, genre_label
+    global rating_label, poster_label, link_label
+    root = tk.Tk()
+    root.title("Letterboxd Random Movie Picker")
+    root.configure(bg=BG_COLOR)
+    root.geometry("440x920")
+    root.resizable(True, True)
+    root.minsize(380, 600)
+    
+    # Configure style with better fonts
+    base_style = {
+        'bg': BG_COLOR,
+        'fg': FG_COLOR,
+        'relief': 'flat'
+    }
+    try:
+        header_font = ('SF Pro Display', 18, 'bold')  # macOS system font
+        body_font = ('SF Pro Text', 11)
+        button_font = ('SF Pro Text', 12, 'bold')
+    except:
+        try:
+            header_font = ('Segoe UI', 18, 'bold')  # Windows system font
+            body_font = ('Segoe UI', 11)
+            button_font = ('Segoe UI', 12, 'bold')
+        except:
+            header_font = ('Helvetica', 18, 'bold')  # Fallback
+            body_font = ('Helvetica', 11)
+            button_font = ('Helvetica', 12, 'bold')
+    
+    default_usernames = "harrybailey1"
+
+    # Configure grid to center content
+    root.grid_columnconfigure(0, weight=1)
+    root.grid_columnconfigure(1, weight=1)
+
+    # Header
+    header_label = tk.Label(root, text="Letterboxd Random Movie Picker", 
+                           font=header_font, 
+                           bg=BG_COLOR, fg=ACCENT_COLOR)
+    header_label.grid(row=0, column=0, columnspan=2, pady=(15, 25), sticky="")
+
+    # Username input
+    username_label = tk.Label(root, text="Usernames:", 
+                             font=body_font, **base_style)
+    username_label.grid(row=1, column=0, sticky="e", padx=(0, 10), pady=(5, 0))
+    
+    username_entry = tk.Text(root, height=3, width=22, 
+                            bg=ENTRY_COLOR, fg=FG_COLOR, 
+                            font=body_font,
+                            insertbackground=FG_COLOR,
+                            relief='flat', bd=3, highlightthickness=1, 
+                            highlightcolor=ACCENT_COLOR, highlightbackground="#334155")
+    username_entry.grid(row=1, column=1, padx=(0, 0), pady=(5, 0), sticky="w")
+    username_entry.insert("1.0", default_usernames)
+    
+    # Help text
+    help_label = tk.Label(root, text="(Enter multiple usernames separated by commas or new lines)", 
+                         font=(body_font[0], 9, 'italic'), 
+                         bg=BG_COLOR, fg="#667788")
+    help_label.grid(row=2, column=0, columnspan=2, pady=(2, 10), sticky="")
+
+    # Filters and weighting
+    filter_frame = tk.Frame(root, bg=BG_COLOR)
+    filter_frame.grid(row=3, column=0, columnspan=2, pady=(0, 5), sticky="")
+    filter_entry_style = {
+        'bg': ENTRY_COLOR, 'fg': FG_COLOR, 'font': body_font,
+        'insertbackground': FG_COLOR, 'relief': 'flat', 'bd': 3,
+        'highlightthickness': 1, 'highlightcolor': ACCENT_COLOR, 'highlightbackground': "#334155"
+    }
+
+    tk.Label(filter_frame, text="Genre:", font=body_font, **base_style).grid(row=0, column=0, sticky="e", padx=(0, 5), pady=2)
+    genre_entry = tk.Entry(filter_frame, width=12, **filter_entry_style)
+    genre_entry.grid(row=0, column=1, sticky="w", pady=2)
+    tk.Label(filter_frame, text="Director:", font=body_font, **base_style).grid(row=0, column=2, sticky="e", padx=(10, 5), pady=2)
+    director_entry = tk.Entry(filter_frame, width=12, **filter_entry_style)
+    director_entry.grid(row=0, column=3, sticky="w", pady=2)
+
+    tk.Label(filter_frame, text="Years:", font=body_font, **base_style).grid(row=1, column=0, sticky="e", padx=(0, 5), pady=2)
+    years_frame = tk.Frame(filter_frame, bg=BG_COLOR)
+    years_frame.grid(row=1, column=1, sticky="w", pady=2)
+    year_from_entry = tk.Entry(years_frame, width=5, **filter_entry_style)
+    year_from_entry.pack(side="left")
+    tk.Label(years_frame, text="–", font=body_font, **base_style).pack(side="left", padx=2)
+    year_to_entry = tk.Entry(years_frame, width=5, **filter_entry_style)
+    year_to_entry.pack(side="left")
+    tk.Label(filter_frame, text="Min rating:", font=body_font, **base_style).grid(row=1, column=2, sticky="e", padx=(10, 5), pady=2)
+    min_rating_entry = tk.Entry(filter_frame, width=5, **filter_entry_style)
+    min_rating_entry.grid(row=1, column=3, sticky="w", pady=2)
+
+    tk.Label(filter_frame, text="Max mins:", font=body_font, **base_style).grid(row=2, column=0, sticky="e", padx=(0, 5), pady=2)
+    max_runtime_entry = tk.Entry(filter_frame, width=5, **filter_entry_style)
+    max_runtime_entry.grid(row=2, column=1, sticky="w", pady=2)
+    tk.Label(filter_frame, text="Favour:", font=body_font, **base_style).grid(row=2, column=2, sticky="e", padx=(10, 5), pady=2)
+    weight_var = tk.StringVar(value="Any film")
+    weight_menu = tk.OptionMenu(filter_frame, weight_var, *WEIGHT_CHOICES)
+    weight_menu.config(bg=ENTRY_COLOR, fg=FG_COLOR, font=body_font, relief='flat', highlightthickness=0, activebackground=BUTTON_COLOR)
+    weight_menu.grid(row=2, column=3, sticky="w", pady=2)
+
+    no_repeat_var = tk.IntVar(value=1)
+    no_repeat_check = tk.Checkbutton(filter_frame, text="Don't repeat films this session", variable=no_repeat_var,
+                                     font=body_font, bg=BG_COLOR, fg=FG_COLOR, selectcolor=ENTRY_COLOR,
+                                     activebackground=BG_COLOR, activeforeground=FG_COLOR)
+    no_repeat_check.grid(row=3, column=0, columnspan=4, pady=(4, 0))
+
+    # Submit button
+    submit_btn = tk.Button(root, text="🎲 Pick Random Movie", 
+                          command=on_submit,
+                          bg=ACCENT_COLOR, fg='#000', 
+                          font=button_font,
+                          relief='flat', bd=0, 
+                          padx=25, pady=12,
+                          cursor='pointinghand',
+                          activebackground="#00b944",  # Darker green when clicked
+                          activeforeground='#000')
+    submit_btn.grid(row=4, column=0, columnspan=2, pady=(15, 25), sticky="")
+
+    # Status/diagnostic label
+    status_label = tk.Label(root, text="No results to show", 
+                           font=(body_font[0], 11), 
+                           bg=BG_COLOR, fg=FG_COLOR,
+                           justify="center", wraplength=380)
+    status_label.grid(row=5, column=0, columnspan=2, pady=(0, 10), sticky="")
+
+    # Movie info display
+    result_label = tk.Label(root, text="", 
+                           font=(header_font[0], 15, 'bold'), 
+                           bg=BG_COLOR, fg=FG_COLOR, 
+                           justify="center", wraplength=380)
+    result_label.grid(row=6, column=0, columnspan=2, pady=(0, 10), sticky="")
+
+    director_label = tk.Label(root, text="", 
+                             font=body_font, 
+                             bg=BG_COLOR, fg="#9ab",
+                             justify="center")
+    director_label.grid(row=7, column=0, columnspan=2, pady=(0, 4), sticky="")
+
+    genre_label = tk.Label(root, text="", 
+                          font=body_font, 
+                          bg=BG_COLOR, fg="#9ab",
+                          justify="center")
+    genre_label = tk.Label(root, text="", 
+                          font=body_font, 
+                          bg=BG_COLOR, fg="#9ab",
+                          justify="center")
+    genre_label.grid(row=8, column=0, columnspan=2, pady=(0, 4), sticky="")
+
+    rating_label = tk.Label(root, text="", 
+                           font=body_font, 
+                           bg=BG_COLOR, fg="#9ab",
+                           justify="center")
+    rating_label.grid(row=9, column=0, columnspan=2, pady=(0, 12), sticky="")
+
+    # Poster
+    poster_label = tk.Label(root, bg=BG_COLOR)
+    poster_label.grid(row=10, column=0, columnspan=2, pady=(0, 12), sticky="")
+
+    # Link
+    link_label = tk.Label(root, text="", 
+                         fg=ACCENT_COLOR, cursor="pointinghand",
+                         bg=BG_COLOR, font=(body_font[0], 11, 'underline'))
+    link_label.grid(row=11, column=0, columnspan=2, pady=(0, 15), sticky="")
+
+    def window_shown():
+        """Runs once the window is on screen: report startup for bench/bench_startup.py, or preload"""
+        root.update_idletasks()
+        probe = os.environ.get("RANDOM_MOVIE_STARTUP_PROBE") # A JSON file holding the launch time
+        if probe:
+            with open(probe) as f:
+                launched_at = json.load(f)["launched_at"]
+            loaded = [name for name in ("pandas", "numpy", "requests", "bs4", "PIL", "httpx", "pyarrow") if name in sys.modules]
+            with open(probe, "w") as f:
+                json.dump({"window_s": time.time() - launched_at, "loaded": loaded}, f)
+            root.destroy()
+            return
+        threading.Thread(target=preload_modules, daemon=True).start()
+
+    root.after(0, window_shown)
+    root.after(config.UI_POLL_MS, poll_ui_queue)
+    root.mainloop()
@@ -0,0 +1,496 @@
+"""
+Random picks from a watchlist (MovieSampler) and the prioritised metadata fetches that keep
+the current watchlist's film details, and the next picks' posters, ready.
+"""
+import threading
+import os, heapq, random, bisect, itertools
+from collections import deque, defaultdict
+from concurrent.futures import Future
+
+from . import config
+from .core import (MetadataBatch, WATCHLIST_COLUMNS, fetch_multiple_watchlists, get_movie_metadata,
+    load_cached_metadata, load_cached_metadata_many, metadata_count, metadata_frame, metadata_key,
+    metadata_keys, metadata_lock, metadata_snapshot, metrics, pd, poster_cache_path, poster_key,
+    prefetch_poster, requests, timed, watchlist_row)
+
+# Global variables for background metadata (poster,title,etc.) fetching
+background_fetch_thread = None
+stop_background_flag = threading.Event()
+
+# Films picked ahead of time per (watchlist key, pick options): {key: deque of (index, slug)}
+upcoming_picks = {}
+
+# Sampling indexes per watchlist key
+samplers = {}
+samplers_lock = threading.Lock()
+
+class FenwickTree:
+    """Prefix sums over sampling weights, so weighted picks and removals are O(log n)"""
+
+    def __init__(self, weights):
+        self.weights = list(weights)
+        self.positive = sum(1 for weight in self.weights if weight > 0)
+        self.tree = [0.0] + self.weights
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+
+    def total(self):
+        if not self.positive:
+            return 0.0  # Exactly, rather than whatever rounding error is left in the tree
+        result = 0.0
+        i = len(self.weights)
+        while i > 0:
+            result += self.tree[i]
+            i -= i & -i
+        return result
+
+    def set(self, i, weight):
+        self.positive += (weight > 0) - (self.weights[i] > 0)
+        delta = weight - self.weights[i]
+        self.weights[i] = weight
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, target):
+        """Index of the item whose cumulative weight range contains target"""
+        position = 0
+        step = 1 << len(self.weights).bit_length()
+        while step:
+            nxt = position + step
+            if nxt < len(self.tree) and self.tree[nxt] <= target:
+                position = nxt
+                target -= self.tree[nxt]
+            step >>= 1
+        position = min(position, len(self.weights) - 1)
+        # Rounding error can land on a removed item; use the nearest one still in play
+        if self.weights[position] <= 0:
+            for i in itertools.chain(range(position + 1, len(self.weights)), range(position - 1, -1, -1)):
+                if self.weights[i] > 0:
+                    return i
+        return position
+
+class MovieSampler:
+    """
+    Random picks from one watchlist with metadata indexes built once up front.
+    Filters: genre, director, year=(min, max), runtime=(min, max), min_rating.
+    Weights: None (uniform), "rating" (favour higher rated), "oldest" (favour films added
+    to the watchlist longest ago) or a function of a row's slim metadata.
+    Each filter/weight combination gets its own candidate pool, after which a pick is O(log n).
+    """
+
+    def __init__(self, df, seen=()):
+        self.df = df
+        self.labels = list(df.index)
+        self.position = {label: i for i, label in enumerate(self.labels)}
+        self.lock = threading.Lock()
+        self.seen = {self.position[label] for label in seen if label in self.position}
+        self.pools = {}
+        
+        columns = metadata_snapshot(df)
+        missing = columns["Metadata"].isna()
+        self.metadata_count = len(df) - int(missing.sum())
+        if missing.any():
+            # Films the background fetch hasn't written yet may already be in the metadata store
+            stored = load_cached_metadata_many(metadata_keys(df[missing]).tolist())
+            if stored:
+                records = columns["Metadata"].where(~missing, metadata_keys(df).map(stored))
+                columns = metadata_frame(records.tolist(), df.index)
+        self.metadata = columns["Metadata"].tolist()
+        years = pd.to_numeric(df["Year"].astype(str), errors="coerce")
+        self.years = [None if pd.isna(year) else int(year) for year in years]
+        self.ratings = columns["Rating"].astype(object).where(columns["Rating"].notna(), None).tolist()
+        
+        # Exact-match indexes, splitting each distinct list of names only once
+        self.by_genre = self._name_index(columns["Genres"])
+        self.by_director = self._name_index(columns["Directors"])
+        # Range indexes: sorted (value, position) pairs searched with bisect
+        self.by_value = {name: self._value_index(values) for name, values in
+                         (("year", years), ("runtime", columns["Runtime"]), ("rating", columns["Rating"]))}
+
+    @staticmethod
+    def _name_index(joined):
+        """{lowercased name: positions} from a column of "|"-joined names"""
+        codes, uniques = pd.factorize(joined)
+        index = defaultdict(set)
+        for code, positions in pd.Series(range(len(codes))).groupby(codes).indices.items():
+            if code < 0:
+                continue  # No details for these films
+            for name in uniques[code].split("|"):
+                if name:
+                    index[name.lower()].update(positions.tolist())
+        return index
+
+    @staticmethod
+    def _value_index(values):
+        values = pd.Series(values).reset_index(drop=True).dropna().sort_values(kind="stable")
+        return list(zip(values.tolist(), values.index.tolist()))
+
+    def _range(self, name, low, high):
+        index = self.by_value[name]
+        start = 0 if low is None else bisect.bisect_left(index, (low, -1))
+        end = len(index) if high is None else bisect.bisect_right(index, (high, len(self.labels)))
+        return {i for _, i in index[start:end]}
+
+    def candidates(self, genre=None, director=None, year=None, runtime=None, min_rating=None):
+        """Sorted positions matching every given filter"""
+        sets = []
+        if genre:
+            sets.append(self.by_genre.get(genre.lower(), set()))
+        if director:
+            sets.append(self.by_director.get(director.lower(), set()))
+        for name, bounds in (("year", year), ("runtime", runtime)):
+            if bounds and (bounds[0] is not None or bounds[1] is not None):
+                sets.append(self._range(name, *bounds))
+        if min_rating is not None:
+            sets.append(self._range("rating", min_rating, None))
+        if not sets:
+            return list(range(len(self.labels)))
+        sets.sort(key=len)
+        return sorted(set.intersection(*sets) if len(sets) > 1 else sets[0])
+
+    def weight(self, i, weight):
+        if weight is None or weight == "uniform":
+            return 1.0
+        if weight == "rating":
+            rating = self.ratings[i]
+            return (rating if rating is not None else 2.5) ** 2
+        if weight == "oldest":
+            return float(i + 1)  # Newest additions come first in a watchlist
+        return float(weight(dict(self.metadata[i] or {}, year=self.years[i])))
+
+    def _pool(self, weight, filters, no_repeat):
+        # No-repeat pools keep seen films at weight 0; repeat pools always sample from every match
+        key = (weight, tuple(sorted(filters.items())), no_repeat)
+        pool = self.pools.get(key)
+        if pool is None:
+            positions = self.candidates(**filters)
+            weights = [0.0 if no_repeat and i in self.seen else self.weight(i, weight) for i in positions]
+            pool = self.pools[key] = (positions, {i: n for n, i in enumerate(positions)}, FenwickTree(weights), weights)
+        return pool
+
+    @timed("sample")
+    def pick(self, n=1, weight=None, no_repeat=True, mark=True, exclude=(), **filters):
+        """Return up to n DataFrame index labels; with no_repeat, films already marked seen are skipped"""
+        filters = {name: value for name, value in filters.items() if value not in (None, "", (None, None))}
+        with self.lock:
+            positions, slot, tree, base_weights = self._pool(weight, filters, no_repeat)
+            if not positions:
+                return []
+            if no_repeat and tree.total() <= 0:
+                if config.DEBUG:
+                    print("Every matching film has been picked this session, starting over")
+                self.seen.difference_update(positions)
+                for n_slot, i in enumerate(positions):
+                    tree.set(n_slot, self.weight(i, weight))
+            
+            # Take out excluded films and each chosen film, then put back what shouldn't stay out
+            removed = []
+            for label in exclude:
+                i = self.position.get(label)
+                if i in slot and tree.weights[slot[i]] > 0:
+                    removed.append((slot[i], tree.weights[slot[i]]))
+                    tree.set(slot[i], 0.0)
+            chosen = []
+            for _ in range(n):
+                total = tree.total()
+                if total <= 0:
+                    break
+                n_slot = tree.find(random.random() * total)
+                chosen.append(positions[n_slot])
+                removed.append((n_slot, tree.weights[n_slot]))
+                tree.set(n_slot, 0.0)
+            for n_slot, weight_value in removed:
+                if not (mark and no_repeat and positions[n_slot] in chosen):
+                    tree.set(n_slot, weight_value)
+        
+        labels = [self.labels[i] for i in chosen]
+        if mark and no_repeat:
+            self.mark_seen(labels)
+        return labels
+
+    def mark_seen(self, labels):
+        """Exclude films from later no-repeat picks in every pool"""
+        with self.lock:
+            for label in labels:
+                i = self.position.get(label)
+                if i is None:
+                    continue
+                self.seen.add(i)
+                for (_, _, no_repeat), (positions, slot, tree, _) in self.pools.items():
+                    if no_repeat and i in slot:
+                        tree.set(slot[i], 0.0)
+
+    def is_seen(self, label):
+        return self.position.get(label) in self.seen
+
+def get_sampler(watchlist_key, df, need_metadata=False):
+    """Cached sampler for a watchlist, rebuilt when the watchlist or its known metadata has grown"""
+    with samplers_lock:
+        sampler = samplers.get(watchlist_key)
+        stale = sampler is None or sampler.df is not df
+        if not stale and need_metadata:
+            stale = metadata_count(df) > sampler.metadata_count
+        if stale:
+            seen = [sampler.labels[i] for i in sampler.seen] if sampler is not None and sampler.df is df else ()
+            sampler = samplers[watchlist_key] = MovieSampler(df, seen)
+        return sampler
+
+def needs_metadata(weight=None, **filters):
+    """Whether a pick's filters or weighting depend on film metadata"""
+    metadata_filters = ("genre", "director", "runtime", "min_rating")
+    return weight == "rating" or callable(weight) or any(filters.get(name) not in (None, "", (None, None)) for name in metadata_filters)
+
+def pick_movies(usernames, n=1, weight=None, no_repeat=True, export_csv=False, **filters):
+    """
+    Pick n random films common to all users' watchlists, returned as DataFrame rows.
+    Filters: genre="Horror", director="...", year=(1970, 1989), runtime=(None, 120), min_rating=3.5.
+    weight: None, "rating", "oldest" or a function of slim metadata; no_repeat skips films
+    already picked this session.
+    """
+    df = fetch_multiple_watchlists(usernames, export_csv=export_csv)
+    if df.empty:
+        return df
+    watchlist_key = usernames[0] if len(usernames) == 1 else tuple(sorted(usernames))
+    
+    need_metadata = needs_metadata(weight, **filters)
+    if need_metadata:
+        # Filtering needs every film's metadata (the store makes this free once warmed up), not their posters
+        fetch_metadata_background(df, prefetch_posters=False)
+    sampler = get_sampler(watchlist_key, df, need_metadata)
+    labels = sampler.pick(n, weight=weight, no_repeat=no_repeat, **filters)
+    with metadata_lock:
+        return df.loc[labels]
+
+# Metadata scheduler priorities, lowest first
+PRIORITY_PICK = 0       # The film being shown right now
+PRIORITY_PREPICK = 1    # Films chosen for the next clicks
+PRIORITY_BACKGROUND = 2 # Everything else in the current watchlist
+
+class MetadataScheduler:
+    """
+    Priority queue of metadata (and poster) fetches served by a few worker threads.
+    Each film has at most one queued or running request: asking again returns the same
+    Future, and asking with a higher priority moves a queued film up the queue.
+    """
+
+    def __init__(self, workers=3):
+        self.workers = workers
+        self.session = None   # Created with the first worker, so import stays light
+        self._condition = threading.Condition()
+        self._heap = []       # (priority, sequence, key); outdated entries are skipped
+        self._jobs = {}       # key -> [future, row, priority, want poster]
+        self._sequence = itertools.count()
+        self._threads = []
+
+    def ensure_workers(self, workers):
+        """Grow the worker pool to at least this many threads"""
+        with self._condition:
+            self.workers = max(self.workers, workers)
+            if self.session is None:
+                self.session = requests.Session()
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def request(self, row, priority=PRIORITY_BACKGROUND, poster=False):
+        """Return a Future for a row's metadata, queueing a fetch only if one isn't already pending"""
+        key = metadata_key(row)
+        with self._condition:
+            job = self._jobs.get(key)
+            if job is not None:
+                job[3] = job[3] or poster
+                if priority < job[2] and not job[0].running():
+                    job[2] = priority
+                    heapq.heappush(self._heap, (priority, next(self._sequence), key))
+                    self._condition.notify()
+                return job[0]
+        
+        # Answer straight from the metadata store when there's nothing left to download
+        metadata = load_cached_metadata(key)
+        if metadata is not None and (not poster or not config.PERSIST_CACHE or not metadata.get("image")
+                                     or os.path.exists(poster_cache_path(poster_key(metadata, row.get("Film ID"))))):
+            future = Future()
+            future.set_result(metadata)
+            return future
+        
+        self.ensure_workers(self.workers)
+        with self._condition:
+            job = self._jobs.get(key)
+            if job is None:
+                job = self._jobs[key] = [Future(), row, priority, poster]
+                heapq.heappush(self._heap, (priority, next(self._sequence), key))
+                self._condition.notify()
+            return job[0]
+
+    def cancel_queued(self, min_priority=PRIORITY_BACKGROUND):
+        """Drop queued (not yet running) requests at or below the given priority"""
+        with self._condition:
+            for key, job in list(self._jobs.items()):
+                if job[2] >= min_priority and job[0].cancel():
+                    del self._jobs[key]
+
+    def pending(self):
+        with self._condition:
+            return len(self._jobs)
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                priority, _, key = heapq.heappop(self._heap)
+                job = self._jobs.get(key)
+                # Skip entries superseded by a priority bump, finished or cancelled
+                if job is None or job[2] != priority or job[0].running() or not job[0].set_running_or_notify_cancel():
+                    continue
+                future, row, _, poster = job
+            
+            try:
+                metadata = get_movie_metadata(row, self.session)
+                if poster and config.PERSIST_CACHE and metadata.get("image"):
+                    try:
+                        prefetch_poster(metadata, self.session, row.get("Film ID"))
+                    except Exception as e:
+                        if config.DEBUG:
+                            print(f"Could not prefetch poster for {key}: {e}")
+                future.set_result(metadata)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._jobs.pop(key, None)
+
+metadata_scheduler = MetadataScheduler()
+
+def fetch_metadata_background(df, workers=3, prefetch_posters=True):
+    """
+    Fetch metadata (and optionally posters) for all movies in the background and add it to the DataFrame.
+    Results go through a MetadataBatch, so they are written a batch at a time rather than film by film.
+    Films whose metadata could not be fetched are left empty, so the next pass asks for them again.
+    """
+    global stop_background_flag
+    
+    if df.empty:
+        return
+    
+    # Only films with a link and no details yet, as plain dicts rather than a Series per row
+    uris = df["Letterboxd URI"]
+    todo = df.loc[metadata_snapshot(df)["Metadata"].isna() & uris.notna() & (uris != ""), WATCHLIST_COLUMNS]
+    keys = metadata_keys(todo)
+    # Fill in whatever the metadata store already has before touching the network
+    stored = load_cached_metadata_many(keys.tolist())
+    metadata_scheduler.ensure_workers(workers)
+    poster = prefetch_posters and config.PERSIST_CACHE
+    batch = MetadataBatch(df)
+    
+    try:
+        futures = []
+        for idx, key, row in zip(todo.index, keys, todo.to_dict("records")):
+            # Check if we should stop
+            if stop_background_flag.is_set():
+                if config.DEBUG:
+                    print("Background metadata fetch stopped")
+                return
+            
+            if key in stored:
+                batch.add(idx, stored[key])
+                if not poster:
+                    continue
+            # Queued behind any pick or pre-pick requests
+            futures.append((idx, row, metadata_scheduler.request(row, PRIORITY_BACKGROUND, poster=poster)))
+        batch.flush()
+        
+        # Collect results as they complete and write them back in batches
+        if config.DEBUG:
+            from tqdm.auto import tqdm
+        fn = tqdm if config.DEBUG else lambda x: x
+        failed = 0
+        for idx, row, future in fn(futures):
+            # Check if we should stop before processing each result
+            if stop_background_flag.is_set():
+                if config.DEBUG:
+                    print("Background metadata fetch stopped during processing")
+                return
+            
+            try:
+                metadata = future.result(timeout=30)  # 30 second timeout per movie
+                if metadata:
+                    batch.add(idx, metadata)
+            except Exception as e:
+                failed += 1
+                if config.DEBUG:
+                    print(f"Could not fetch metadata for {row['Slug']}: {e}")
+    finally:
+        batch.flush()  # Whatever has arrived is kept, even when stopped early
+    if failed:
+        print(f"Could not fetch metadata for {failed} of {len(futures)} movies; they will be retried on the next pass")
+
+def options_key(options):
+    return tuple(sorted(options.items()))
+
+def next_pick(watchlist_key, df, options):
+    """Take the next pre-picked row for these pick options, or pick a fresh one with the sampler"""
+    sampler = get_sampler(watchlist_key, df, needs_metadata(**options))
+    picks = upcoming_picks.get((watchlist_key, options_key(options)))
+    while picks:
+        idx, slug = picks.popleft()
+        # The watchlist may have been refreshed since the film was picked
+        if idx in df.index and df.at[idx, "Slug"] == slug and not (options.get("no_repeat") and sampler.is_seen(idx)):
+            if options.get("no_repeat"):
+                sampler.mark_seen([idx])
+            metrics.count("cache_hits_total", cache="prepick")
+            return idx, watchlist_row(df, idx)
+    metrics.count("cache_misses_total", cache="prepick")
+    labels = sampler.pick(1, **options)
+    if not labels:
+        raise Exception("No movies match the selected filters.")
+    return labels[0], watchlist_row(df, labels[0])
+
+def prepick(watchlist_key, df, options, count=None):
+    """Pick the next few films now and fetch their metadata and posters ahead of the next clicks"""
+    count = config.PREPICK_COUNT if count is None else count
+    sampler = get_sampler(watchlist_key, df, needs_metadata(**options))
+    picks = upcoming_picks.setdefault((watchlist_key, options_key(options)), deque())
+    if len(picks) >= count:
+        return
+    for idx in sampler.pick(count - len(picks), mark=False, exclude=[idx for idx, _ in picks], **options):
+        row = watchlist_row(df, idx)
+        picks.append((idx, row["Slug"]))
+        metadata_scheduler.request(row, PRIORITY_PREPICK, poster=True)
+
+def start_background_metadata_fetch(df):
+    """Start background metadata fetching in a separate thread"""
+    global background_fetch_thread, stop_background_flag
+    
+    # Stop any existing background fetching first
+    stop_background_metadata_fetch()
+    
+    # Clear the stop flag for the new background fetch
+    stop_background_flag.clear()
+    
+    background_fetch_thread = threading.Thread(
+        target=fetch_metadata_background, 
+        args=(df, 3),
+        daemon=True
+    )
+    background_fetch_thread.start()
+
+def stop_background_metadata_fetch():
+    """Stop the background metadata fetching"""
+    global background_fetch_thread, stop_background_flag
+    
+    # Set the stop flag to signal the background thread to stop
+    stop_background_flag.set()
+    metadata_scheduler.cancel_queued(PRIORITY_BACKGROUND)
+    
+    # Wait a short time for the thread to notice the stop flag
+    if background_fetch_thread and background_fetch_thread.is_alive():
+        background_fetch_thread.join(timeout=1.0)  # Wait up to 1 second
+    
+    # Reset the thread reference
+    background_fetch_thread = None
@@ -0,0 +1,144 @@
+"""
+Headless JSON API over the same caches and sampler as the window: `python -m random_movie serve`.
+"""
+import json
+from urllib.parse import urlparse, parse_qs, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from . import config
+from .core import (WATCHLIST_COLUMNS, fetch_multiple_watchlists, fetch_watchlist, get_shared_session,
+    metadata_lock, metrics, timed)
+from .sampling import PRIORITY_PICK, metadata_scheduler
+
+def movie_summary(row, metadata=None):
+    """JSON-friendly view of a watchlist row, with the display fields from its metadata"""
+    summary = {column: row[column] for column in WATCHLIST_COLUMNS}
+    if metadata:
+        summary["Director"] = metadata["directors"][0] if metadata.get("directors") else "Unknown"
+        summary["Genre"] = metadata["genres"][0] if metadata.get("genres") else "Unknown"
+        summary["Rating"] = metadata.get("rating")
+        summary["Runtime"] = metadata.get("runtime")
+        summary["Poster"] = metadata.get("image")
+    return summary
+
+def api_watchlist(username):
+    df = fetch_watchlist(username)
+    return {"user": username, "count": len(df), "partial": bool(df.attrs.get("partial")), "movies": df[WATCHLIST_COLUMNS].to_dict("records")}
+
+def api_intersection(usernames):
+    df = fetch_multiple_watchlists(usernames)
+    return {"users": usernames, "count": len(df), "partial": bool(df.attrs.get("partial")), "movies": df[WATCHLIST_COLUMNS].to_dict("records")}
+
+@timed("api_pick")
+def api_pick(usernames, n=1):
+    df = fetch_multiple_watchlists(usernames)
+    if df.empty:
+        raise LookupError("No movies found in the intersection of all users' watchlists.")
+    with metadata_lock:
+        sample = df.sample(min(n, len(df)))
+    
+    # Metadata comes from the shared store; misses jump the scheduler queue and share in-flight fetches
+    rows = [row for _, row in sample.iterrows()]
+    futures = [metadata_scheduler.request(row, PRIORITY_PICK) for row in rows]
+    picks = []
+    for row, future in zip(rows, futures):
+        try:
+            picks.append(movie_summary(row, future.result(timeout=30)))
+        except Exception as e:
+            if config.DEBUG:
+                print(f"Could not fetch metadata for {row['Slug']}: {e}")
+            picks.append(movie_summary(row))
+    metrics.log_json("pick", users=usernames)
+    return {"users": usernames, "count": len(df), "partial": bool(df.attrs.get("partial")), "picks": picks}
+
+class PickerRequestHandler(BaseHTTPRequestHandler):
+    """JSON API: /pick?users=a,b&n=3, /watchlist/{user}, /intersection?users=a,b, plus /metrics (Prometheus text)"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if config.DEBUG:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        usernames = [u.strip() for u in ",".join(params.get("users", [])).split(",") if u.strip()]
+        try:
+            if url.path == "/pick":
+                if not usernames:
+                    raise ValueError("users is required")
+                self.send_json(200, api_pick(usernames, int(params.get("n", ["1"])[0])))
+            elif url.path.startswith("/watchlist/") and url.path.count("/") == 2:
+                self.send_json(200, api_watchlist(unquote(url.path.split("/")[2])))
+            elif url.path == "/intersection":
+                if not usernames:
+                    raise ValueError("users is required")
+                self.send_json(200, api_intersection(usernames))
+            elif url.path == "/metrics":
+                data = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self.send_json(404, {"error": "Not found"})
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+        except LookupError as e:
+            self.send_json(404, {"error": str(e)})
+        except Exception as e:
+            if config.DEBUG:
+                print(f"Error handling {self.path}: {e}")
+            self.send_json(502, {"error": str(e)})
+
+class PickerServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+def serve(host=None, port=None, workers=32):
+    """Run the headless JSON API until interrupted (on SERVER_HOST and SERVER_PORT by default)"""
+    host = config.SERVER_HOST if host is None else host
+    port = config.SERVER_PORT if port is None else port
+    metadata_scheduler.session = get_shared_session()
+    metadata_scheduler.ensure_workers(workers)
+    server = PickerServer((host, port), PickerRequestHandler)
+    print(f"Serving on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def serve_main(argv):
+    """Command line entry point for `python -m random_movie serve`"""
+    import argparse
+    parser = argparse.ArgumentParser(prog="random_movie serve", description="Headless JSON API for the movie picker")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=32, help="threads for metadata fetches")
+    parser.add_argument("--letterboxd", help="base URL of a Letterboxd stand-in, e.g. http://127.0.0.1:9000")
+    parser.add_argument("--no-metrics", action="store_true", help="don't record metrics (/metrics will be empty)")
+    parser.add_argument("--metrics-log", help="append a JSON metrics snapshot to this file after every pick")
+    parser.add_argument("--fresh-for", type=float, help="hours a stored watchlist is used without checking Letterboxd, e.g. after `random_movie warm`")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args(argv)
+    metrics.enabled = not args.no_metrics
+    if args.fresh_for is not None:
+        config.WATCHLIST_FRESH_FOR = args.fresh_for * 3600
+    config.METRICS_LOG = args.metrics_log or config.METRICS_LOG
+    if args.letterboxd:
+        base = args.letterboxd.rstrip("/")
+        config.WATCHLIST_URL = base + "/{}/watchlist/page/{}/"
+        config.FILM_URL = base + "/film/{}/"
+    config.DEBUG = config.DEBUG or args.debug
+    serve(args.host, args.port, args.workers)